@@ -0,0 +1,101 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.routes import calculate_coalescer
+from app.core.tracing import trace_buffer
+from app.db.base import get_db_session
+from app.services.spend_aggregator import query_rollups, spend_aggregator
+from app.services.tenant_store import tenant_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get(
+    "/coalescing",
+    responses={
+        200: {
+            "description": "Request coalescing counters for /discounts/calculate",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "requests": 1000,
+                        "computations": 40,
+                        "coalesced": 960,
+                        "coalescing_ratio": 0.96,
+                        "in_flight": 2,
+                    }
+                }
+            },
+        }
+    },
+)
+def coalescing_stats():
+    return calculate_coalescer.stats()
+
+
+@router.get("/traces")
+def list_traces(limit: int = 50):
+    return trace_buffer.list(limit)
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(trace_id: str):
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace.to_dict()
+
+
+@router.get("/tenants")
+def resident_tenants():
+    return {"resident": tenant_store.resident_tenants, "max_resident": tenant_store.max_tenants}
+
+
+@router.post("/tenants/{tenant_id}", status_code=201)
+def provision_tenant(tenant_id: str, seed: bool = False):
+    # Idempotent: existing tables and rules are kept, seeding skips rules already present
+    tenant_store.provision(tenant_id, seed=seed)
+    return {"tenant": tenant_id, "seeded": seed}
+
+
+@router.get(
+    "/discount-spend",
+    responses={
+        200: {
+            "description": "Hourly discount spend per rule (flushed rollups only)",
+            "content": {
+                "application/json": {
+                    "example": [
+                        {"tenant": None, "hour": "2026-10-19T10:00:00", "rule": "brand:PUMA:40%", "amount": 40000.0, "events": 100},
+                        {"tenant": None, "hour": "2026-10-19T10:00:00", "rule": "bank:ICICI:10%", "amount": 5400.0, "events": 100},
+                    ]
+                }
+            },
+        }
+    },
+)
+def discount_spend(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    rule: Optional[str] = None,
+    tenant: Optional[str] = None,
+    db: Session = Depends(get_db_session),
+):
+    return [
+        {
+            "tenant": row.tenant,
+            "hour": row.hour,
+            "rule": row.rule,
+            "amount": Decimal(row.amount_minor).scaleb(-2),
+            "events": row.events,
+        }
+        for row in query_rollups(db, start=start, end=end, rule=rule, tenant=tenant)
+    ]
+
+
+@router.get("/discount-spend/stats")
+def discount_spend_stats():
+    return spend_aggregator.stats()
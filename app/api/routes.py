@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Header, Request
 from fastapi import status
 from sqlalchemy.orm import Session
 from decimal import Decimal
+from typing import Optional
+import asyncio
+import hashlib
+import os
 
 from app.api.schemas import (
     CalculateRequest,
     DiscountedPrice as DiscountedPriceSchema,
+    LineDiscount as LineDiscountSchema,
+    RuleEdits as RuleEditsSchema,
+    SimulationReport as SimulationReportSchema,
     ValidateCodeRequest,
     ValidateCodeResponse,
 )
-from app.db.base import get_db_session
+from app.core.coalesce import RequestCoalescer
+from app.core.config import settings
+from app.core.errors import DiscountServiceError, ErrorCode
+from app.db.base import SessionLocal
 from app.services.discount_service import (
     DiscountService,
     CartItem as DCartItem,
@@ -17,9 +27,44 @@ from app.services.discount_service import (
     PaymentInfo as DPaymentInfo,
     Product as DProduct,
 )
+from app.services.rule_timeline import RuleTimeline, rule_timeline
+from app.services.simulator import RuleEdits, simulate
+from app.services.spend_aggregator import spend_aggregator
+from app.services.tenant_store import tenant_store
 
 router = APIRouter(prefix="/discounts", tags=["discounts"])
 
+# Identical concurrent /calculate payloads share one computation
+calculate_coalescer = RequestCoalescer()
+
+
+def get_tenant_id(x_tenant_id: Optional[str] = Header(default=None)) -> Optional[str]:
+    return x_tenant_id
+
+
+def open_tenant_session(tenant_id: Optional[str]) -> Session:
+    # No tenant header: the single default database from settings.sqlite_url
+    return tenant_store.session(tenant_id) if tenant_id else SessionLocal()
+
+
+def get_tenant_db_session(tenant_id: Optional[str] = Depends(get_tenant_id)):
+    db = open_tenant_session(tenant_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def timeline_for(tenant_id: Optional[str]):
+    return tenant_store.timeline(tenant_id) if tenant_id else rule_timeline
+
+
+async def resolve_timeline(tenant_id: Optional[str]):
+    # A cold or evicted tenant loads its rules from the DB; keep that off the event loop
+    if not tenant_id:
+        return rule_timeline
+    return await asyncio.to_thread(tenant_store.timeline, tenant_id)
+
 
 def map_cart_items(items):
     mapped = []
@@ -54,6 +99,17 @@ def map_cart_items(items):
                             "bank:ICICI:10%": 54.0,
                         },
                         "message": "Discounts applied successfully",
+                        "line_items": [
+                            {
+                                "product_id": "sku-1",
+                                "quantity": 1,
+                                "unit_price": 1000.0,
+                                "brand_discount": 400.0,
+                                "category_discount": 60.0,
+                                "final_unit_price": 540.0,
+                                "line_total": 540.0,
+                            }
+                        ],
                     }
                 }
             },
@@ -61,6 +117,7 @@ def map_cart_items(items):
     },
 )
 async def calculate_discounts(
+    request: Request,
     payload: CalculateRequest = Body(
         ...,
         example={
@@ -83,28 +140,58 @@ async def calculate_discounts(
             "voucher_code": "SUPER69",
         },
     ),
-    db: Session = Depends(get_db_session),
+    tenant_id: Optional[str] = Depends(get_tenant_id),
 ):
-    service = DiscountService(db)
-    result = await service.calculate_cart_discounts(
-        cart_items=map_cart_items(payload.cart_items),
-        customer=DCustomerProfile(id=payload.customer.id, tier=payload.customer.tier),
-        payment_info=(
-            DPaymentInfo(
-                method=payload.payment_info.method,
-                bank_name=payload.payment_info.bank_name,
-                card_type=payload.payment_info.card_type,
+    timeline = await resolve_timeline(tenant_id)
+
+    async def compute():
+        # The session belongs to the (possibly shared) computation, not to the leader request,
+        # so followers are unaffected if the leader's client disconnects
+        db = open_tenant_session(tenant_id)
+        try:
+            service = DiscountService(db, timeline=timeline)
+            return await service.calculate_cart_discounts(
+                cart_items=map_cart_items(payload.cart_items),
+                customer=DCustomerProfile(id=payload.customer.id, tier=payload.customer.tier),
+                payment_info=(
+                    DPaymentInfo(
+                        method=payload.payment_info.method,
+                        bank_name=payload.payment_info.bank_name,
+                        card_type=payload.payment_info.card_type,
+                    )
+                    if payload.payment_info
+                    else None
+                ),
+                voucher_code=payload.voucher_code,
             )
-            if payload.payment_info
-            else None
-        ),
-        voucher_code=payload.voucher_code,
-    )
+        finally:
+            db.close()
+
+    if settings.coalesce_requests:
+        # Byte-identical bodies coalesce; the digest avoids re-serializing large carts on the event loop
+        key = (tenant_id, hashlib.blake2b(await request.body(), digest_size=16).digest())
+        result = await calculate_coalescer.run(key, compute)
+    else:
+        result = await compute()
+    # Write-behind: buffered in memory, aggregated and flushed by a background task
+    spend_aggregator.record(result.applied_discounts, tenant=tenant_id)
     return DiscountedPriceSchema(
         original_price=result.original_price,
         final_price=result.final_price,
         applied_discounts=result.applied_discounts,
         message=result.message,
+        line_items=[
+            LineDiscountSchema(
+                product_id=line.product_id,
+                quantity=line.quantity,
+                unit_price=line.unit_price,
+                brand_discount=line.brand_discount,
+                category_discount=line.category_discount,
+                final_unit_price=line.final_unit_price,
+                line_total=line.line_total,
+            )
+            for line in result.line_items
+        ],
     )
 
 
@@ -165,12 +252,59 @@ async def validate_code(
             "customer": {"id": "cust-3", "tier": "silver"},
         },
     ),
-    db: Session = Depends(get_db_session),
+    tenant_id: Optional[str] = Depends(get_tenant_id),
+    db: Session = Depends(get_tenant_db_session),
 ):
-    service = DiscountService(db)
+    service = DiscountService(db, timeline=await resolve_timeline(tenant_id))
     valid = await service.validate_discount_code(
         code=payload.code,
         cart_items=map_cart_items(payload.cart_items),
         customer=DCustomerProfile(id=payload.customer.id, tier=payload.customer.tier),
     )
     return ValidateCodeResponse(valid=valid)
+
+
+@router.post(
+    "/simulate",
+    response_model=SimulationReportSchema,
+    responses={
+        200: {
+            "description": "Change in revenue and discount spend over the stored cart corpus",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "carts": 1000000,
+                        "affected_carts": 120000,
+                        "voucher_rejections": 0,
+                        "baseline_revenue": 64800000.0,
+                        "scenario_revenue": 54000000.0,
+                        "revenue_delta": -10800000.0,
+                        "baseline_discount": 55200000.0,
+                        "scenario_discount": 66000000.0,
+                        "discount_delta": 10800000.0,
+                        "rule_deltas": {"brand:PUMA:40%": -48000000.0, "brand:PUMA:50%": 60000000.0},
+                    }
+                }
+            },
+        }
+    },
+)
+def simulate_price_sensitivity(
+    edits: RuleEditsSchema = Body(..., example={"brand": {"PUMA": 50}}),
+    tenant_id: Optional[str] = Depends(get_tenant_id),
+    db: Session = Depends(get_tenant_db_session),
+):
+    # Sync handler: FastAPI runs it in the threadpool while the process pool does the work
+    if not os.path.exists(settings.simulation_corpus_path):
+        raise DiscountServiceError(ErrorCode.SIMULATION_CORPUS_MISSING, "Cart corpus not found")
+    timeline = timeline_for(tenant_id)
+    if not timeline.loaded:
+        timeline = RuleTimeline()
+        timeline.load(db)
+    report = simulate(
+        settings.simulation_corpus_path,
+        timeline.active(),
+        RuleEdits.from_dict(edits.model_dump()),
+        workers=settings.simulation_workers or None,
+    )
+    return SimulationReportSchema(**report.to_dict())
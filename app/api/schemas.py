@@ -43,11 +43,22 @@ class CustomerProfile(BaseModel):
     tier: CustomerTier
 
 
+class LineDiscount(BaseModel):
+    product_id: str
+    quantity: int
+    unit_price: Decimal
+    brand_discount: Decimal = Field(..., description="Brand discount per unit")
+    category_discount: Decimal = Field(..., description="Category discount per unit")
+    final_unit_price: Decimal
+    line_total: Decimal
+
+
 class DiscountedPrice(BaseModel):
     original_price: Decimal
     final_price: Decimal
     applied_discounts: Dict[str, Decimal]
     message: str
+    line_items: List[LineDiscount] = Field(default_factory=list)
 
 
 class CalculateRequest(BaseModel):
@@ -65,3 +76,25 @@ class ValidateCodeRequest(BaseModel):
 
 class ValidateCodeResponse(BaseModel):
     valid: bool
+
+
+class RuleEdits(BaseModel):
+    brand: Dict[str, Optional[int]] = Field(default_factory=dict, description="Brand -> percent (null removes)")
+    category: Dict[str, Optional[int]] = Field(default_factory=dict, description="Category -> percent (null removes)")
+    voucher: Dict[str, Optional[int]] = Field(default_factory=dict, description="Voucher code -> percent (null removes)")
+    bank: Dict[str, Optional[int]] = Field(
+        default_factory=dict, description='"BANK" re-rates its offers, "BANK:METHOD" replaces them (null removes)'
+    )
+
+
+class SimulationReport(BaseModel):
+    carts: int
+    affected_carts: int
+    voucher_rejections: int
+    baseline_revenue: Decimal
+    scenario_revenue: Decimal
+    revenue_delta: Decimal
+    baseline_discount: Decimal
+    scenario_discount: Decimal
+    discount_delta: Decimal
+    rule_deltas: Dict[str, Decimal]
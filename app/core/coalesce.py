@@ -0,0 +1,48 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.core.tracing import trace_event
+
+
+class RequestCoalescer:
+    """
+    In-flight deduplication for async calls.
+
+    Concurrent calls with the same key await one shared computation and all
+    receive its result (or its exception). Nothing is cached once the
+    computation finishes.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.requests = 0
+        self.computations = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        self.requests += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.computations += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+            trace_event("coalesce.lead")
+        else:
+            trace_event("coalesce.join")
+        # Shield so one cancelled caller does not cancel the computation for the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        coalesced = self.requests - self.computations
+        return {
+            "requests": self.requests,
+            "computations": self.computations,
+            "coalesced": coalesced,
+            "coalescing_ratio": (coalesced / self.requests) if self.requests else 0.0,
+            "in_flight": len(self._inflight),
+        }
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.computations = 0
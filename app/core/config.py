@@ -5,6 +5,28 @@ import os
 class Settings(BaseModel):
     sqlite_url: str = os.getenv("DISCOUNT_DB_URL", "sqlite:///./discounts.db")
     app_name: str = "Discount Service"
+    # Per-tenant databases selected by the X-Tenant-ID header; {tenant} is replaced by the tenant id
+    tenant_db_url_template: str = os.getenv("DISCOUNT_TENANT_DB_URL", "sqlite:///./tenants/{tenant}.db")
+    # Tenants whose engine and rule timeline stay in memory; colder tenants are evicted (LRU)
+    max_resident_tenants: int = int(os.getenv("DISCOUNT_MAX_RESIDENT_TENANTS", "64"))
+    # How often the in-memory rule timeline is reloaded from the DB to pick up rule edits
+    rules_refresh_seconds: int = int(os.getenv("DISCOUNT_RULES_REFRESH_SECONDS", "60"))
+    # Share one computation between identical in-flight /discounts/calculate payloads
+    coalesce_requests: bool = os.getenv("DISCOUNT_COALESCE_REQUESTS", "1") == "1"
+    # Opt-in request tracing: forced by the X-Discount-Trace header, or sampled at this rate (0..1)
+    trace_sample_rate: float = float(os.getenv("DISCOUNT_TRACE_SAMPLE_RATE", "0"))
+    trace_buffer_size: int = int(os.getenv("DISCOUNT_TRACE_BUFFER_SIZE", "200"))
+    # Attach a cProfile capture to traced requests slower than this (0 disables profiling)
+    trace_profile_threshold_ms: float = float(os.getenv("DISCOUNT_TRACE_PROFILE_THRESHOLD_MS", "0"))
+    # Also profile traces forced via the X-Discount-Trace header (off: any client could switch cProfile on)
+    trace_header_profiling: bool = os.getenv("DISCOUNT_TRACE_HEADER_PROFILING", "0") == "1"
+    # Discount-spend rollups: bounded in-process buffer, drained into memory and flushed to the DB in batches
+    spend_buffer_size: int = int(os.getenv("DISCOUNT_SPEND_BUFFER_SIZE", "10000"))
+    spend_drain_seconds: float = float(os.getenv("DISCOUNT_SPEND_DRAIN_SECONDS", "0.5"))
+    spend_flush_seconds: float = float(os.getenv("DISCOUNT_SPEND_FLUSH_SECONDS", "60"))
+    # Price-sensitivity simulator: JSONL corpus of /discounts/calculate payloads, and process count (0 = CPU count)
+    simulation_corpus_path: str = os.getenv("DISCOUNT_SIMULATION_CORPUS", "./carts.jsonl")
+    simulation_workers: int = int(os.getenv("DISCOUNT_SIMULATION_WORKERS", "0"))
 
 
 settings = Settings()
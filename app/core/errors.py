@@ -8,6 +8,10 @@ class ErrorCode(str, Enum):
     BRAND_EXCLUDED = "BRAND_EXCLUDED"
     CATEGORY_RESTRICTED = "CATEGORY_RESTRICTED"
     CUSTOMER_TIER_REQUIRED = "CUSTOMER_TIER_REQUIRED"
+    TENANT_INVALID = "TENANT_INVALID"
+    TENANT_UNKNOWN = "TENANT_UNKNOWN"
+    SIMULATION_CORPUS_MISSING = "SIMULATION_CORPUS_MISSING"
+    SIMULATION_BUSY = "SIMULATION_BUSY"
 
 
 class DiscountServiceError(Exception):
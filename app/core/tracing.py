@@ -0,0 +1,170 @@
+from __future__ import annotations
+import cProfile
+import io
+import pstats
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock, RLock
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+
+class Trace:
+    """Step-by-step record of one request, with nanosecond offsets from its start."""
+
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self._start_ns = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+        self.steps: List[Dict[str, Any]] = []
+        self.profile: Optional[str] = None
+
+    def event(self, name: str, **detail: Any) -> None:
+        self.steps.append({"step": name, "at_ns": time.perf_counter_ns() - self._start_ns, **detail})
+
+    def finish(self) -> None:
+        self.duration_ns = time.perf_counter_ns() - self._start_ns
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ns": self.duration_ns,
+            "steps": len(self.steps),
+            "profiled": self.profile is not None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.summary(), "steps": self.steps, "profile": self.profile}
+
+
+class _Span:
+    def __init__(self, trace: Trace, name: str, detail: Dict[str, Any]):
+        self._trace = trace
+        self._name = name
+        self._detail = detail
+
+    def __enter__(self) -> "_Span":
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._trace.steps.append(
+            {
+                "step": self._name,
+                "at_ns": self._start_ns - self._trace._start_ns,
+                "duration_ns": time.perf_counter_ns() - self._start_ns,
+                **self._detail,
+            }
+        )
+
+
+class _NullSpan:
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("discount_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def trace_event(name: str, **detail: Any) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.event(name, **detail)
+
+
+def trace_span(name: str, **detail: Any):
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, detail)
+
+
+def start_trace(name: str):
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token) -> None:
+    _current_trace.reset(token)
+
+
+class TraceBuffer:
+    """Bounded ring buffer of finished traces; oldest entries are dropped first."""
+
+    def __init__(self, maxlen: int = 200):
+        self._traces: deque[Trace] = deque(maxlen=maxlen)
+        self._lock = RLock()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            latest = list(self._traces)[-limit:] if limit > 0 else []
+        return [t.summary() for t in reversed(latest)]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.id == trace_id:
+                    return trace
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+class RequestProfiler:
+    """
+    cProfile wrapper that keeps a capture only for requests slower than a threshold.
+
+    The profiler covers the whole event-loop thread while the request is in
+    flight, so a capture also includes any other coroutines (and requests)
+    the loop ran meanwhile. Only one profiler can be active at a time; traced
+    requests that overlap a running capture get no capture of their own.
+    """
+
+    _active = Lock()
+
+    def __init__(self, threshold_ms: float, top: int = 30):
+        self.threshold_ns = int(threshold_ms * 1_000_000)
+        self.top = top
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        if not RequestProfiler._active.acquire(blocking=False):
+            return
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self, trace: Trace) -> None:
+        if self._profile is None:
+            return
+        self._profile.disable()
+        RequestProfiler._active.release()
+        if trace.duration_ns is not None and trace.duration_ns >= self.threshold_ns:
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+            trace.profile = out.getvalue()
+        self._profile = None
+
+
+# Process-wide ring buffer read by the admin endpoints
+trace_buffer = TraceBuffer(settings.trace_buffer_size)
@@ -1,4 +1,5 @@
-from sqlalchemy import Integer, String, UniqueConstraint
+from datetime import datetime
+from sqlalchemy import DateTime, Index, Integer, String, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column
 from enum import Enum
 from app.db.base import Base
@@ -15,9 +16,20 @@ class BrandDiscount(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     brand: Mapped[str] = mapped_column(String, index=True, nullable=False)
     discount_percent: Mapped[int] = mapped_column(Integer, nullable=False)  # e.g., 40 for 40%
+    # Optional validity window (naive UTC); NULL means open-ended
+    starts_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
+    ends_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
 
     __table_args__ = (
-        UniqueConstraint("brand", name="uq_brand"),
+        UniqueConstraint("brand", "starts_at", name="uq_brand_window"),
+        # NULLs are distinct in unique constraints, so open-ended rules need their own index
+        Index(
+            "uq_brand_open_ended",
+            "brand",
+            unique=True,
+            sqlite_where=text("starts_at IS NULL"),
+            postgresql_where=text("starts_at IS NULL"),
+        ),
     )
 
 
@@ -27,9 +39,20 @@ class CategoryDiscount(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     category: Mapped[str] = mapped_column(String, index=True, nullable=False)
     discount_percent: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Optional validity window (naive UTC); NULL means open-ended
+    starts_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
+    ends_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
 
     __table_args__ = (
-        UniqueConstraint("category", name="uq_category"),
+        UniqueConstraint("category", "starts_at", name="uq_category_window"),
+        # NULLs are distinct in unique constraints, so open-ended rules need their own index
+        Index(
+            "uq_category_open_ended",
+            "category",
+            unique=True,
+            sqlite_where=text("starts_at IS NULL"),
+            postgresql_where=text("starts_at IS NULL"),
+        ),
     )
 
 
@@ -41,15 +64,57 @@ class BankOffer(Base):
     payment_method: Mapped[str] = mapped_column(String, nullable=False)  # CARD, UPI, etc.
     card_type: Mapped[str | None] = mapped_column(String, nullable=True)  # CREDIT, DEBIT
     discount_percent: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Optional validity window (naive UTC); NULL means open-ended
+    starts_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
+    ends_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
 
 
 class Voucher(Base):
     __tablename__ = "vouchers"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    code: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
+    code: Mapped[str] = mapped_column(String, index=True, nullable=False)
     discount_percent: Mapped[int] = mapped_column(Integer, nullable=False)
     # Optional constraints
     excluded_brands: Mapped[str | None] = mapped_column(String, nullable=True)  # CSV
     allowed_categories: Mapped[str | None] = mapped_column(String, nullable=True)  # CSV
     required_customer_tier: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Optional validity window (naive UTC); NULL means open-ended
+    starts_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
+    ends_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("code", "starts_at", name="uq_voucher_window"),
+        # NULLs are distinct in unique constraints, so open-ended vouchers need their own index
+        Index(
+            "uq_voucher_open_ended",
+            "code",
+            unique=True,
+            sqlite_where=text("starts_at IS NULL"),
+            postgresql_where=text("starts_at IS NULL"),
+        ),
+    )
+
+
+class DiscountSpendRollup(Base):
+    __tablename__ = "discount_spend_rollups"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    tenant: Mapped[str | None] = mapped_column(String, index=True, nullable=True)  # NULL for the default database
+    hour: Mapped[datetime] = mapped_column(DateTime, index=True, nullable=False)  # start of the UTC hour
+    rule: Mapped[str] = mapped_column(String, index=True, nullable=False)  # e.g., brand:PUMA:40%
+    amount_minor: Mapped[int] = mapped_column(Integer, nullable=False)  # discount total in minor units (paise)
+    events: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("tenant", "hour", "rule", name="uq_spend_rollup"),
+        # NULLs are distinct in unique constraints, so default-database rollups need their own index
+        Index(
+            "uq_spend_rollup_default",
+            "hour",
+            "rule",
+            unique=True,
+            sqlite_where=text("tenant IS NULL"),
+            postgresql_where=text("tenant IS NULL"),
+        ),
+    )
@@ -11,13 +11,13 @@ def create_tables():
 def seed_data(db: Session) -> None:
     # Seed brand discounts
     for bd in BRAND_DISCOUNTS:
-        existing = db.query(models.BrandDiscount).filter_by(brand=bd["brand"]).one_or_none()
+        existing = db.query(models.BrandDiscount).filter_by(brand=bd["brand"], starts_at=bd.get("starts_at")).one_or_none()
         if not existing:
             db.add(models.BrandDiscount(**bd))
 
     # Seed category discounts
     for cd in CATEGORY_DISCOUNTS:
-        existing = db.query(models.CategoryDiscount).filter_by(category=cd["category"]).one_or_none()
+        existing = db.query(models.CategoryDiscount).filter_by(category=cd["category"], starts_at=cd.get("starts_at")).one_or_none()
         if not existing:
             db.add(models.CategoryDiscount(**cd))
 
@@ -33,7 +33,7 @@ def seed_data(db: Session) -> None:
 
     # Seed vouchers
     for v in VOUCHERS:
-        existing = db.query(models.Voucher).filter_by(code=v["code"]).one_or_none()
+        existing = db.query(models.Voucher).filter_by(code=v["code"], starts_at=v.get("starts_at")).one_or_none()
         if not existing:
             db.add(models.Voucher(**v))
 
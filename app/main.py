@@ -1,11 +1,44 @@
+import asyncio
+import logging
+import random
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.api.admin import router as admin_router
 from app.api.routes import router as discounts_router
 from app.db.seed import create_tables, seed_data
 from app.db.base import SessionLocal
 from app.core.errors import DiscountServiceError
 from app.core.config import settings
+from app.core.tracing import RequestProfiler, end_trace, start_trace, trace_buffer
+from app.services.rule_timeline import rule_timeline
+from app.services.simulator import shutdown_executor
+from app.services.spend_aggregator import spend_aggregator
+from app.services.tenant_store import tenant_store
+
+logger = logging.getLogger(__name__)
+
+
+def reload_rule_timeline() -> None:
+    db = SessionLocal()
+    try:
+        rule_timeline.load(db)
+    finally:
+        db.close()
+    tenant_store.reload_all()
+
+
+async def refresh_rule_timeline(interval_seconds: int) -> None:
+    # Pick up rule edits off the request path; scheduled boundaries need no reload
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(reload_rule_timeline)
+        except Exception:
+            logger.exception("Failed to reload rule timeline")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -14,12 +47,81 @@ async def lifespan(app: FastAPI):
     db = SessionLocal()
     try:
         seed_data(db)
-        yield
+        rule_timeline.load(db)
     finally:
         db.close()
+    background = [
+        asyncio.create_task(refresh_rule_timeline(settings.rules_refresh_seconds)),
+        asyncio.create_task(spend_aggregator.run(settings.spend_drain_seconds, settings.spend_flush_seconds)),
+    ]
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        try:
+            # Waits for a flush interrupted by the cancellation above, then writes the remainder
+            await spend_aggregator.flush()
+        except Exception:
+            logger.exception("Failed to flush discount spend rollups on shutdown")
+        tenant_store.clear()
+        shutdown_executor()
 
 app = FastAPI(title=settings.app_name, lifespan=lifespan)
 app.include_router(discounts_router)
+app.include_router(admin_router)
+
+TRACE_HEADER = b"x-discount-trace"
+
+
+class TraceMiddleware:
+    """
+    Pure ASGI middleware for opt-in request tracing.
+
+    Untraced requests (no trace header, not sampled) are handed straight to the
+    app, so tracing costs nothing when it is off.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        forced = any(name == TRACE_HEADER and value.lower() in (b"1", b"true", b"yes") for name, value in scope["headers"])
+        sampled = bool(settings.trace_sample_rate) and random.random() < settings.trace_sample_rate
+        if not forced and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = start_trace(f"{scope['method']} {scope['path']}")
+        # Clients can force a trace, but only sampled requests are profiled unless explicitly allowed
+        profile = settings.trace_profile_threshold_ms > 0 and (sampled or settings.trace_header_profiling)
+        profiler = RequestProfiler(settings.trace_profile_threshold_ms) if profile else None
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.event("response", status_code=message["status"])
+                MutableHeaders(scope=message).append("X-Trace-Id", trace.id)
+            await send(message)
+
+        if profiler:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            trace.finish()
+            if profiler:
+                profiler.stop(trace)
+            end_trace(token)
+            trace_buffer.add(trace)
+
+
+app.add_middleware(TraceMiddleware)
+
 
 @app.get("/health")
 def health():
@@ -1,13 +1,17 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from decimal import Decimal, ROUND_HALF_UP
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Dict, List, MutableMapping, Optional
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
 from app.core.errors import DiscountServiceError, ErrorCode
 from app.db.models import BankOffer, BrandDiscount, CategoryDiscount, Voucher
 from app.core.cache import SimpleTTLCache
+from app.core.tracing import trace_event, trace_span
+from app.services.rule_timeline import RuleTimeline
 
 
 class BrandTier(str, Enum):
@@ -46,12 +50,24 @@ class PaymentInfo:
     card_type: Optional[str]  # CREDIT, DEBIT
 
 
+@dataclass
+class LineDiscount:
+    product_id: str
+    quantity: int
+    unit_price: Decimal
+    brand_discount: Decimal  # per unit
+    category_discount: Decimal  # per unit
+    final_unit_price: Decimal
+    line_total: Decimal
+
+
 @dataclass
 class DiscountedPrice:
     original_price: Decimal
     final_price: Decimal
     applied_discounts: Dict[str, Decimal]
     message: str
+    line_items: List[LineDiscount] = field(default_factory=list)
 
 
 @dataclass
@@ -71,10 +87,153 @@ def _apply_percent(amount: Decimal, percent: int) -> Decimal:
     return discount
 
 
+@dataclass(frozen=True)
+class _UnitPricing:
+    brand_percent: int
+    brand_discount: Decimal
+    category_percent: int
+    category_discount: Decimal
+    final_unit_price: Decimal
+
+
+def _price_unit(
+    brand: str,
+    category: str,
+    unit_price: Decimal,
+    brand_discounts: Dict[str, int],
+    category_discounts: Dict[str, int],
+) -> _UnitPricing:
+    # Brand discount first
+    brand_percent = brand_discounts.get(brand.lower(), 0)
+    brand_discount = _apply_percent(unit_price, brand_percent) if brand_percent else Decimal("0.00")
+    price_after_brand = unit_price - brand_discount
+
+    # Category discount next
+    category_percent = category_discounts.get(category.lower(), 0)
+    category_discount = _apply_percent(price_after_brand, category_percent) if category_percent else Decimal("0.00")
+
+    return _UnitPricing(
+        brand_percent=brand_percent,
+        brand_discount=brand_discount,
+        category_percent=category_percent,
+        category_discount=category_discount,
+        final_unit_price=price_after_brand - category_discount,
+    )
+
+
+def _active_window(model, now: datetime):
+    return and_(
+        or_(model.starts_at.is_(None), model.starts_at <= now),
+        or_(model.ends_at.is_(None), model.ends_at > now),
+    )
+
+
 class DiscountService:
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        timeline: Optional[RuleTimeline] = None,
+        unit_cache: Optional[MutableMapping[tuple, _UnitPricing]] = None,
+    ):
         self.db = db
         self.cache = SimpleTTLCache(default_ttl_seconds=300)
+        # When a loaded timeline is supplied, rules are served from memory (no DB on the request path)
+        self.timeline = timeline if timeline is not None and timeline.loaded else None
+        # Unit pricings shared across calls; only valid while the rule set is fixed (e.g. simulations)
+        self.unit_cache = unit_cache
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def _cached(self, key: str, factory):
+        value = self.cache.get(key)
+        if value is not None:
+            trace_event("cache.hit", key=key)
+            return value
+        with trace_span("cache.miss", key=key):
+            value = factory()
+        self.cache.set(key, value)
+        return value
+
+    def _brand_discounts(self) -> Dict[str, int]:
+        if self.timeline:
+            trace_event("timeline.lookup", rules="brand_discounts")
+            return self.timeline.active().brand_discounts
+        now = self._now()
+        return self._cached(
+            "brand_discounts",
+            lambda: {
+                bd.brand.lower(): bd.discount_percent
+                for bd in self.db.query(BrandDiscount)
+                .filter(_active_window(BrandDiscount, now))
+                .order_by(BrandDiscount.starts_at.asc().nulls_first(), BrandDiscount.id)
+            },
+        )
+
+    def _category_discounts(self) -> Dict[str, int]:
+        if self.timeline:
+            trace_event("timeline.lookup", rules="category_discounts")
+            return self.timeline.active().category_discounts
+        now = self._now()
+        return self._cached(
+            "category_discounts",
+            lambda: {
+                cd.category.lower(): cd.discount_percent
+                for cd in self.db.query(CategoryDiscount)
+                .filter(_active_window(CategoryDiscount, now))
+                .order_by(CategoryDiscount.starts_at.asc().nulls_first(), CategoryDiscount.id)
+            },
+        )
+
+    def _bank_offers(self, bank_name: str, method: str):
+        if self.timeline:
+            trace_event("timeline.lookup", rules="bank_offers", key=f"{bank_name}:{method}")
+            return self.timeline.active().bank_offers.get((bank_name, method), ())
+        now = self._now()
+        return self._cached(
+            f"bank_offers:{bank_name}:{method}",
+            lambda: (
+                self.db.query(BankOffer)
+                .filter(
+                    BankOffer.bank_name == bank_name,
+                    BankOffer.payment_method == method,
+                    _active_window(BankOffer, now),
+                )
+                .order_by(BankOffer.id)
+                .all()
+            ),
+        )
+
+    def _unit_pricing(self, key: tuple, brand_discounts: Dict[str, int], category_discounts: Dict[str, int]) -> _UnitPricing:
+        pricing = self.unit_cache.get(key) if self.unit_cache is not None else None
+        if pricing is None:
+            brand, category, unit_price = key
+            pricing = _price_unit(brand, category, unit_price, brand_discounts, category_discounts)
+            trace_event(
+                "rule.evaluate",
+                brand=brand,
+                category=category,
+                unit_price=str(unit_price),
+                brand_percent=pricing.brand_percent,
+                category_percent=pricing.category_percent,
+            )
+            if self.unit_cache is not None:
+                self.unit_cache[key] = pricing
+        return pricing
+
+    def _voucher(self, code: str):
+        if self.timeline:
+            trace_event("timeline.lookup", rules="vouchers", key=code)
+            return self.timeline.active().vouchers.get(code)
+        now = self._now()
+        return self._cached(
+            f"voucher:{code}",
+            # Overlapping windows for one code: the newest row wins, as in the timeline
+            lambda: self.db.query(Voucher)
+            .filter(Voucher.code == code, _active_window(Voucher, now))
+            .order_by(Voucher.id.desc())
+            .first(),
+        )
 
     async def calculate_cart_discounts(
         self,
@@ -82,86 +241,100 @@ class DiscountService:
         customer: CustomerProfile,
         payment_info: Optional[PaymentInfo] = None,
         voucher_code: Optional[str] = None,
+    ) -> DiscountedPrice:
+        return self.price_cart(cart_items, customer, payment_info, voucher_code)
+
+    def price_cart(
+        self,
+        cart_items: List[CartItem],
+        customer: CustomerProfile,
+        payment_info: Optional[PaymentInfo] = None,
+        voucher_code: Optional[str] = None,
     ) -> DiscountedPrice:
         """
         Calculate final price after applying discount logic:
         - First apply brand/category discounts
         - Then apply coupon codes (not auto-applied here)
         - Then apply bank offers
+
+        Synchronous core of `calculate_cart_discounts`; batch callers (the
+        simulator) use it directly to avoid an event-loop round trip per cart.
         """
         original_total = Decimal("0.00")
         subtotal_after_item_discounts = Decimal("0.00")
         applied: Dict[str, Decimal] = {}
+        line_items: List[LineDiscount] = []
 
-        # Preload discounts (cached)
-        brand_discounts: Dict[str, int] = self.cache.get_or_set(
-            "brand_discounts",
-            lambda: {bd.brand.lower(): bd.discount_percent for bd in self.db.query(BrandDiscount).all()},
-        )
-        category_discounts: Dict[str, int] = self.cache.get_or_set(
-            "category_discounts",
-            lambda: {cd.category.lower(): cd.discount_percent for cd in self.db.query(CategoryDiscount).all()},
-        )
+        # Preload discounts (timeline or cached)
+        brand_discounts = self._brand_discounts()
+        category_discounts = self._category_discounts()
 
+        # Lines sharing (brand, category, unit price) are priced once and reused
+        shared: Dict[tuple, _UnitPricing] = {}
+        quantities: Dict[tuple, int] = {}
         for item in cart_items:
-            unit_price = _to_decimal(item.product.base_price)
-            original_total += (unit_price * item.quantity)
+            # Quantized once on read so every money field on the line, and the cart totals, stay at 2 decimals
+            unit_price = _to_decimal(item.product.base_price).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+            key = (item.product.brand, item.product.category, unit_price)
+            pricing = shared.get(key)
+            if pricing is None:
+                pricing = self._unit_pricing(key, brand_discounts, category_discounts)
+                shared[key] = pricing
+            quantities[key] = quantities.get(key, 0) + item.quantity
 
-            # Brand discount first
-            brand_percent = brand_discounts.get(item.product.brand.lower(), 0)
-            brand_discount_amount = _apply_percent(unit_price, brand_percent) if brand_percent else Decimal("0.00")
-            price_after_brand = unit_price - brand_discount_amount
-
-            if brand_percent:
-                applied_key = f"brand:{item.product.brand}:{brand_percent}%"
-                applied[applied_key] = applied.get(applied_key, Decimal("0.00")) + (brand_discount_amount * item.quantity)
+            # Update product current price for transparency
+            item.product.current_price = pricing.final_unit_price
+
+            line_items.append(
+                LineDiscount(
+                    product_id=item.product.id,
+                    quantity=item.quantity,
+                    unit_price=unit_price,
+                    brand_discount=pricing.brand_discount,
+                    category_discount=pricing.category_discount,
+                    final_unit_price=pricing.final_unit_price,
+                    line_total=pricing.final_unit_price * item.quantity,
+                )
+            )
 
-            # Category discount next
-            category_percent = category_discounts.get(item.product.category.lower(), 0)
-            category_discount_amount = _apply_percent(price_after_brand, category_percent) if category_percent else Decimal("0.00")
-            final_unit_price = price_after_brand - category_discount_amount
+        trace_event("lines.priced", lines=len(cart_items), distinct=len(shared))
 
-            if category_percent:
-                applied_key = f"category:{item.product.category}:{category_percent}%"
-                applied[applied_key] = applied.get(applied_key, Decimal("0.00")) + (category_discount_amount * item.quantity)
+        # Cart totals and the applied breakdown are accumulated once per distinct line
+        for (brand, category, unit_price), pricing in shared.items():
+            quantity = quantities[(brand, category, unit_price)]
+            original_total += unit_price * quantity
+            subtotal_after_item_discounts += pricing.final_unit_price * quantity
 
-            # Update product current price for transparency
-            item.product.current_price = final_unit_price
+            if pricing.brand_percent:
+                applied_key = f"brand:{brand}:{pricing.brand_percent}%"
+                applied[applied_key] = applied.get(applied_key, Decimal("0.00")) + (pricing.brand_discount * quantity)
 
-            subtotal_after_item_discounts += (final_unit_price * item.quantity)
+            if pricing.category_percent:
+                applied_key = f"category:{category}:{pricing.category_percent}%"
+                applied[applied_key] = applied.get(applied_key, Decimal("0.00")) + (pricing.category_discount * quantity)
 
         # Apply voucher on subtotal after item-level discounts
         voucher_discount_total = Decimal("0.00")
         if voucher_code:
-            voucher: Voucher | None = self.cache.get_or_set(
-                f"voucher:{voucher_code}",
-                lambda: self.db.query(Voucher).filter(Voucher.code == voucher_code).one_or_none(),
-            )
+            voucher = self._voucher(voucher_code)
             if not voucher:
                 raise DiscountServiceError(ErrorCode.DISCOUNT_CODE_INVALID, "Discount code does not exist")
 
             # Reuse validation rules
-            await self.validate_discount_code(voucher_code, cart_items, customer)
+            with trace_span("voucher.validate", code=voucher_code):
+                self.check_discount_code(voucher_code, cart_items, customer)
 
             voucher_discount_total = _apply_percent(subtotal_after_item_discounts, voucher.discount_percent)
 
         # Bank offer on subtotal (after voucher)
         bank_discount_total = Decimal("0.00")
         if payment_info and payment_info.bank_name:
-            offers = self.cache.get_or_set(
-                f"bank_offers:{payment_info.bank_name}:{payment_info.method}",
-                lambda: (
-                    self.db.query(BankOffer)
-                    .filter(
-                        BankOffer.bank_name == payment_info.bank_name,
-                        BankOffer.payment_method == payment_info.method,
-                    )
-                    .all()
-                ),
-            )
+            offers = self._bank_offers(payment_info.bank_name, payment_info.method)
             for offer in offers:
                 if offer.card_type and payment_info.card_type and (offer.card_type.upper() != payment_info.card_type.upper()):
+                    trace_event("rule.skip", rule=f"bank:{offer.bank_name}:{offer.discount_percent}%", reason="card_type")
                     continue
+                trace_event("rule.evaluate", rule=f"bank:{offer.bank_name}:{offer.discount_percent}%")
                 discount_amount = _apply_percent(subtotal_after_item_discounts - voucher_discount_total, offer.discount_percent)
                 bank_discount_total += discount_amount
                 applied_key = f"bank:{offer.bank_name}:{offer.discount_percent}%"
@@ -172,12 +345,14 @@ class DiscountService:
             applied[applied_key] = applied.get(applied_key, Decimal("0.00")) + voucher_discount_total
 
         final_total = (subtotal_after_item_discounts - voucher_discount_total - bank_discount_total).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        trace_event("calculate.done", final_price=str(final_total))
 
         return DiscountedPrice(
             original_price=original_total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP),
             final_price=final_total,
             applied_discounts={k: v.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) for k, v in applied.items()},
             message="Discounts applied successfully",
+            line_items=line_items,
         )
 
     async def validate_discount_code(
@@ -186,12 +361,21 @@ class DiscountService:
         cart_items: List[CartItem],
         customer: CustomerProfile,
     ) -> bool:
-        voucher: Voucher | None = self.db.query(Voucher).filter(Voucher.code == code).one_or_none()
+        return self.check_discount_code(code, cart_items, customer)
+
+    def check_discount_code(
+        self,
+        code: str,
+        cart_items: List[CartItem],
+        customer: CustomerProfile,
+    ) -> bool:
+        voucher = self._voucher(code)
         if not voucher:
             raise DiscountServiceError(ErrorCode.DISCOUNT_CODE_INVALID, "Discount code does not exist")
 
         # Check brand exclusions
         excluded_brands = [b.strip().lower() for b in (voucher.excluded_brands or "").split(",") if b.strip()]
+        trace_event("voucher.check", rule="excluded_brands", values=excluded_brands)
         if excluded_brands:
             for item in cart_items:
                 if item.product.brand.lower() in excluded_brands:
@@ -199,12 +383,14 @@ class DiscountService:
 
         # Check allowed categories
         allowed_categories = [c.strip().lower() for c in (voucher.allowed_categories or "").split(",") if c.strip()]
+        trace_event("voucher.check", rule="allowed_categories", values=allowed_categories)
         if allowed_categories:
             for item in cart_items:
                 if item.product.category.lower() not in allowed_categories:
                     raise DiscountServiceError(ErrorCode.CATEGORY_RESTRICTED, f"Category {item.product.category} not eligible")
 
         # Check customer tier requirement
+        trace_event("voucher.check", rule="required_customer_tier", values=voucher.required_customer_tier)
         if voucher.required_customer_tier and voucher.required_customer_tier.lower() != customer.tier.value.lower():
             raise DiscountServiceError(ErrorCode.CUSTOMER_TIER_REQUIRED, "Customer tier not eligible for this voucher")
 
@@ -0,0 +1,225 @@
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from threading import RLock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.db.models import BankOffer, BrandDiscount, CategoryDiscount, Voucher
+
+
+_ACTIVATE = 1
+_EXPIRE = 0
+
+
+@dataclass(frozen=True)
+class PercentRule:
+    id: int
+    name: str
+    discount_percent: int
+    starts_at: float  # epoch seconds, -inf when open-ended
+
+
+@dataclass(frozen=True)
+class BankOfferRule:
+    id: int
+    bank_name: str
+    payment_method: str
+    card_type: Optional[str]
+    discount_percent: int
+
+
+@dataclass(frozen=True)
+class VoucherRule:
+    id: int
+    code: str
+    discount_percent: int
+    excluded_brands: Optional[str]
+    allowed_categories: Optional[str]
+    required_customer_tier: Optional[str]
+
+
+@dataclass(frozen=True)
+class ActiveRules:
+    """Immutable view of the rules active between two timeline boundaries."""
+
+    brand_discounts: Dict[str, int] = field(default_factory=dict)
+    category_discounts: Dict[str, int] = field(default_factory=dict)
+    bank_offers: Dict[Tuple[str, str], Tuple[BankOfferRule, ...]] = field(default_factory=dict)
+    vouchers: Dict[str, VoucherRule] = field(default_factory=dict)
+
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _resolve(kind: str, bucket: Dict[int, Any]) -> Any:
+    if not bucket:
+        return None
+    if kind == "bank_offers":
+        return tuple(bucket[rule_id] for rule_id in sorted(bucket))
+    if kind == "vouchers":
+        return bucket[max(bucket)]
+    # Overlapping brand/category windows: the most recently started rule wins
+    winner = max(bucket.values(), key=lambda r: (r.starts_at, r.id))
+    return winner.discount_percent
+
+
+class RuleTimeline:
+    """
+    In-memory index of all discount rules and their validity windows.
+
+    Rules are loaded once; future activations and expirations are kept as a
+    sorted event list. Reads are lock-free until the next boundary is crossed,
+    at which point only the affected keys are re-resolved.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._lock = RLock()
+        self._loaded = False
+        self._candidates: Dict[str, Dict[Any, Dict[int, Any]]] = {}
+        self._events: List[tuple] = []
+        self._cursor = 0
+        self._next_boundary = float("inf")
+        self._active = ActiveRules()
+
+    @classmethod
+    def fixed(cls, rules: ActiveRules) -> "RuleTimeline":
+        """A loaded timeline that always serves `rules` (no boundaries)."""
+        timeline = cls()
+        timeline._active = rules
+        timeline._loaded = True
+        return timeline
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def next_boundary(self) -> float:
+        return self._next_boundary
+
+    def now(self) -> float:
+        return self._clock()
+
+    def load(self, db: Session) -> None:
+        now = self._clock()
+        candidates: Dict[str, Dict[Any, Dict[int, Any]]] = {
+            "brand_discounts": {},
+            "category_discounts": {},
+            "bank_offers": {},
+            "vouchers": {},
+        }
+        events: List[tuple] = []
+
+        def add(kind: str, key: Any, rule: Any, starts_at: Optional[datetime], ends_at: Optional[datetime]) -> None:
+            start = _epoch(starts_at)
+            end = _epoch(ends_at)
+            if end is not None and (end <= now or (start is not None and end <= start)):
+                return
+            if start is None or start <= now:
+                candidates[kind].setdefault(key, {})[rule.id] = rule
+            else:
+                events.append((start, len(events), _ACTIVATE, kind, key, rule))
+            if end is not None:
+                events.append((end, len(events), _EXPIRE, kind, key, rule))
+
+        for row in db.query(
+            BrandDiscount.id, BrandDiscount.brand, BrandDiscount.discount_percent, BrandDiscount.starts_at, BrandDiscount.ends_at
+        ):
+            start = _epoch(row.starts_at)
+            rule = PercentRule(row.id, row.brand, row.discount_percent, float("-inf") if start is None else start)
+            add("brand_discounts", row.brand.lower(), rule, row.starts_at, row.ends_at)
+
+        for row in db.query(
+            CategoryDiscount.id,
+            CategoryDiscount.category,
+            CategoryDiscount.discount_percent,
+            CategoryDiscount.starts_at,
+            CategoryDiscount.ends_at,
+        ):
+            start = _epoch(row.starts_at)
+            rule = PercentRule(row.id, row.category, row.discount_percent, float("-inf") if start is None else start)
+            add("category_discounts", row.category.lower(), rule, row.starts_at, row.ends_at)
+
+        for offer in db.query(BankOffer):
+            rule = BankOfferRule(offer.id, offer.bank_name, offer.payment_method, offer.card_type, offer.discount_percent)
+            add("bank_offers", (offer.bank_name, offer.payment_method), rule, offer.starts_at, offer.ends_at)
+
+        for voucher in db.query(Voucher):
+            rule = VoucherRule(
+                voucher.id,
+                voucher.code,
+                voucher.discount_percent,
+                voucher.excluded_brands,
+                voucher.allowed_categories,
+                voucher.required_customer_tier,
+            )
+            add("vouchers", voucher.code, rule, voucher.starts_at, voucher.ends_at)
+
+        events.sort(key=lambda e: (e[0], e[1]))
+        active = ActiveRules(
+            **{
+                kind: {key: value for key, value in ((k, _resolve(kind, b)) for k, b in buckets.items()) if value is not None}
+                for kind, buckets in candidates.items()
+            }
+        )
+
+        with self._lock:
+            self._candidates = candidates
+            self._events = events
+            self._cursor = 0
+            self._active = active
+            self._next_boundary = events[0][0] if events else float("inf")
+            self._loaded = True
+
+    def active(self) -> ActiveRules:
+        now = self._clock()
+        if now < self._next_boundary:
+            return self._active
+        with self._lock:
+            self._advance(now)
+            return self._active
+
+    def _advance(self, now: float) -> None:
+        touched: Dict[str, set] = {}
+        events = self._events
+        while self._cursor < len(events) and events[self._cursor][0] <= now:
+            _, _, op, kind, key, rule = events[self._cursor]
+            buckets = self._candidates[kind]
+            if op == _ACTIVATE:
+                buckets.setdefault(key, {})[rule.id] = rule
+            else:
+                bucket = buckets.get(key)
+                if bucket is not None:
+                    bucket.pop(rule.id, None)
+                    if not bucket:
+                        del buckets[key]
+            touched.setdefault(kind, set()).add(key)
+            self._cursor += 1
+
+        if touched:
+            updated = {}
+            for kind, keys in touched.items():
+                resolved = dict(getattr(self._active, kind))
+                for key in keys:
+                    value = _resolve(kind, self._candidates[kind].get(key, {}))
+                    if value is None:
+                        resolved.pop(key, None)
+                    else:
+                        resolved[key] = value
+                updated[kind] = resolved
+            self._active = ActiveRules(
+                **{kind: updated.get(kind, getattr(self._active, kind)) for kind in self._candidates}
+            )
+        self._next_boundary = events[self._cursor][0] if self._cursor < len(events) else float("inf")
+
+
+# Process-wide timeline, loaded on startup and refreshed in the background
+rule_timeline = RuleTimeline()
@@ -0,0 +1,365 @@
+from __future__ import annotations
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from decimal import Decimal
+from itertools import count
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.errors import DiscountServiceError, ErrorCode
+from app.services.discount_service import (
+    BrandTier,
+    CartItem,
+    CustomerProfile,
+    CustomerTier,
+    DiscountedPrice,
+    DiscountService,
+    PaymentInfo,
+    Product,
+    _to_decimal,
+)
+from app.services.rule_timeline import ActiveRules, BankOfferRule, RuleTimeline, VoucherRule
+
+
+@dataclass
+class RuleEdits:
+    """
+    Hypothetical rule changes; a percent of None removes the rule.
+
+    Bank keys are either "BANK" (re-rate every existing offer of that bank) or
+    "BANK:METHOD" (replace the offers for that pair with a single offer).
+    """
+
+    brand: Dict[str, Optional[int]] = field(default_factory=dict)
+    category: Dict[str, Optional[int]] = field(default_factory=dict)
+    voucher: Dict[str, Optional[int]] = field(default_factory=dict)
+    bank: Dict[str, Optional[int]] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RuleEdits":
+        return cls(**{name: dict(data.get(name) or {}) for name in ("brand", "category", "voucher", "bank")})
+
+
+@dataclass
+class SimulationReport:
+    """
+    Outcome of replaying a cart corpus under edited rules.
+
+    Revenue and discount totals cover the affected carts only; every other
+    cart prices identically in both runs and contributes no change.
+    """
+
+    carts: int = 0
+    affected_carts: int = 0
+    voucher_rejections: int = 0  # carts priced without their voucher because it no longer validated
+    baseline_revenue: Decimal = Decimal("0.00")
+    scenario_revenue: Decimal = Decimal("0.00")
+    baseline_discount: Decimal = Decimal("0.00")
+    scenario_discount: Decimal = Decimal("0.00")
+    rule_deltas: Dict[str, Decimal] = field(default_factory=dict)
+
+    @property
+    def revenue_delta(self) -> Decimal:
+        return self.scenario_revenue - self.baseline_revenue
+
+    @property
+    def discount_delta(self) -> Decimal:
+        return self.scenario_discount - self.baseline_discount
+
+    def merge(self, other: "SimulationReport") -> None:
+        self.carts += other.carts
+        self.affected_carts += other.affected_carts
+        self.voucher_rejections += other.voucher_rejections
+        self.baseline_revenue += other.baseline_revenue
+        self.scenario_revenue += other.scenario_revenue
+        self.baseline_discount += other.baseline_discount
+        self.scenario_discount += other.scenario_discount
+        for rule, delta in other.rule_deltas.items():
+            self.rule_deltas[rule] = self.rule_deltas.get(rule, Decimal("0.00")) + delta
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "carts": self.carts,
+            "affected_carts": self.affected_carts,
+            "voucher_rejections": self.voucher_rejections,
+            "baseline_revenue": self.baseline_revenue,
+            "scenario_revenue": self.scenario_revenue,
+            "revenue_delta": self.revenue_delta,
+            "baseline_discount": self.baseline_discount,
+            "scenario_discount": self.scenario_discount,
+            "discount_delta": self.discount_delta,
+            "rule_deltas": {rule: delta for rule, delta in sorted(self.rule_deltas.items()) if delta},
+        }
+
+
+def apply_edits(rules: ActiveRules, edits: RuleEdits) -> ActiveRules:
+    brand_discounts = dict(rules.brand_discounts)
+    for brand, percent in edits.brand.items():
+        if percent:
+            brand_discounts[brand.lower()] = percent
+        else:
+            brand_discounts.pop(brand.lower(), None)
+
+    category_discounts = dict(rules.category_discounts)
+    for category, percent in edits.category.items():
+        if percent:
+            category_discounts[category.lower()] = percent
+        else:
+            category_discounts.pop(category.lower(), None)
+
+    vouchers = dict(rules.vouchers)
+    for code, percent in edits.voucher.items():
+        if percent is None:
+            vouchers.pop(code, None)
+        elif code in vouchers:
+            vouchers[code] = replace(vouchers[code], discount_percent=percent)
+        else:
+            vouchers[code] = VoucherRule(0, code, percent, None, None, None)
+
+    bank_offers = dict(rules.bank_offers)
+    for key, percent in edits.bank.items():
+        if ":" in key:
+            bank_name, method = key.split(":", 1)
+            if percent is None:
+                bank_offers.pop((bank_name, method), None)
+            else:
+                bank_offers[(bank_name, method)] = (BankOfferRule(0, bank_name, method, None, percent),)
+            continue
+        for pair, offers in list(bank_offers.items()):
+            if pair[0] != key:
+                continue
+            if percent is None:
+                del bank_offers[pair]
+            else:
+                bank_offers[pair] = tuple(replace(offer, discount_percent=percent) for offer in offers)
+
+    return ActiveRules(
+        brand_discounts=brand_discounts,
+        category_discounts=category_discounts,
+        bank_offers=bank_offers,
+        vouchers=vouchers,
+    )
+
+
+class _ScenarioUnitCache(dict):
+    """Scenario unit pricings; lines untouched by the edits fall through to the baseline cache."""
+
+    def __init__(self, baseline: Dict[tuple, Any], affected: Callable[[tuple], bool]):
+        super().__init__()
+        self._baseline = baseline
+        self._affected = affected
+
+    def get(self, key: tuple, default: Any = None) -> Any:
+        if self._affected(key):
+            return super().get(key, default)
+        return self._baseline.get(key, default)
+
+    def __setitem__(self, key: tuple, value: Any) -> None:
+        if self._affected(key):
+            super().__setitem__(key, value)
+        else:
+            self._baseline[key] = value
+
+
+class _SimulationState:
+    def __init__(self, baseline_rules: ActiveRules, scenario_rules: ActiveRules, edits: RuleEdits):
+        self.brands: Set[str] = {b.lower() for b in edits.brand}
+        self.categories: Set[str] = {c.lower() for c in edits.category}
+        self.vouchers: Set[str] = set(edits.voucher)
+        # "BANK" edits touch every payment with that bank, "BANK:METHOD" edits only that pair
+        self.banks: Set[str] = {key for key in edits.bank if ":" not in key}
+        self.bank_methods: Set[Tuple[str, str]] = {tuple(key.split(":", 1)) for key in edits.bank if ":" in key}
+
+        baseline_units: Dict[tuple, Any] = {}
+        self.baseline = DiscountService(None, timeline=RuleTimeline.fixed(baseline_rules), unit_cache=baseline_units)
+        self.scenario = DiscountService(
+            None,
+            timeline=RuleTimeline.fixed(scenario_rules),
+            unit_cache=_ScenarioUnitCache(baseline_units, self._line_affected),
+        )
+
+    def _line_affected(self, key: tuple) -> bool:
+        brand, category, _ = key
+        return brand.lower() in self.brands or category.lower() in self.categories
+
+    def cart_affected(self, cart: Dict[str, Any]) -> bool:
+        if cart.get("voucher_code") in self.vouchers:
+            return True
+        payment = cart.get("payment_info") or {}
+        if payment.get("bank_name") in self.banks or (payment.get("bank_name"), payment.get("method")) in self.bank_methods:
+            return True
+        return any(
+            item["product"]["brand"].lower() in self.brands or item["product"]["category"].lower() in self.categories
+            for item in cart["cart_items"]
+        )
+
+    def price(self, service: DiscountService, cart: Dict[str, Any]) -> Tuple[DiscountedPrice, bool]:
+        cart_items, customer, payment_info, voucher_code = _parse_cart(cart)
+        try:
+            return service.price_cart(cart_items, customer, payment_info, voucher_code), False
+        except DiscountServiceError:
+            if not voucher_code:
+                raise
+        # The shopper checks out without a voucher that no longer applies
+        return service.price_cart(cart_items, customer, payment_info, None), True
+
+
+def _parse_cart(cart: Dict[str, Any]) -> Tuple[List[CartItem], CustomerProfile, Optional[PaymentInfo], Optional[str]]:
+    cart_items = []
+    for item in cart["cart_items"]:
+        p = item["product"]
+        base_price = _to_decimal(p["base_price"])
+        product = Product(
+            id=p["id"],
+            brand=p["brand"],
+            brand_tier=BrandTier(p.get("brand_tier", BrandTier.REGULAR.value)),
+            category=p["category"],
+            base_price=base_price,
+            current_price=_to_decimal(p.get("current_price", base_price)),
+        )
+        cart_items.append(CartItem(product=product, quantity=item["quantity"], size=item.get("size", "")))
+    customer = CustomerProfile(id=cart["customer"]["id"], tier=CustomerTier(cart["customer"]["tier"]))
+    payment = cart.get("payment_info")
+    payment_info = (
+        PaymentInfo(method=payment["method"], bank_name=payment.get("bank_name"), card_type=payment.get("card_type"))
+        if payment
+        else None
+    )
+    return cart_items, customer, payment_info, cart.get("voucher_code")
+
+
+def _iter_range(path: str, start: int, end: int) -> Iterator[Dict[str, Any]]:
+    # A line belongs to the range containing its first byte
+    with open(path, "rb") as fh:
+        if start:
+            fh.seek(start - 1)
+            if fh.read(1) != b"\n":
+                fh.readline()
+        while fh.tell() < end:
+            line = fh.readline()
+            if not line:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def _byte_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    size = os.path.getsize(path)
+    step = max(1, -(-size // max(1, parts)))
+    return [(start, min(size, start + step)) for start in range(0, size, step)]
+
+
+def _simulate_range(path: str, start: int, end: int, state: _SimulationState) -> SimulationReport:
+    report = SimulationReport()
+    for cart in _iter_range(path, start, end):
+        report.carts += 1
+        if not state.cart_affected(cart):
+            continue
+        baseline, baseline_rejected = state.price(state.baseline, cart)
+        scenario, scenario_rejected = state.price(state.scenario, cart)
+        report.affected_carts += 1
+        report.voucher_rejections += int(baseline_rejected or scenario_rejected)
+        report.baseline_revenue += baseline.final_price
+        report.scenario_revenue += scenario.final_price
+        report.baseline_discount += baseline.original_price - baseline.final_price
+        report.scenario_discount += scenario.original_price - scenario.final_price
+        for rule, amount in baseline.applied_discounts.items():
+            report.rule_deltas[rule] = report.rule_deltas.get(rule, Decimal("0.00")) - amount
+        for rule, amount in scenario.applied_discounts.items():
+            report.rule_deltas[rule] = report.rule_deltas.get(rule, Decimal("0.00")) + amount
+    return report
+
+
+# Worker-side state, rebuilt when a task from a new simulation arrives
+_worker_state: Optional[_SimulationState] = None
+_worker_run: Optional[int] = None
+
+
+def _simulate_task(
+    run_id: int,
+    baseline_rules: ActiveRules,
+    scenario_rules: ActiveRules,
+    edits: RuleEdits,
+    path: str,
+    start: int,
+    end: int,
+) -> SimulationReport:
+    global _worker_state, _worker_run
+    if _worker_run != run_id:
+        _worker_state = _SimulationState(baseline_rules, scenario_rules, edits)
+        _worker_run = run_id
+    return _simulate_range(path, start, end, _worker_state)
+
+
+# One simulation at a time on one long-lived pool. Workers are spawned rather than
+# forked: forking the threaded API server can deadlock the child.
+_pool_lock = Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size = 0
+_run_ids = count(1)
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_size
+    if _pool is None or _pool_size != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _pool_size = workers
+    return _pool
+
+
+def shutdown_executor() -> None:
+    # Called at app shutdown; does not wait for a running simulation
+    global _pool, _pool_size
+    pool, _pool, _pool_size = _pool, None, 0
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def simulate(corpus_path: str, baseline_rules: ActiveRules, edits: RuleEdits, workers: Optional[int] = None) -> SimulationReport:
+    """
+    Replay a JSONL corpus of carts (one /discounts/calculate payload per line)
+    under `baseline_rules` and under the same rules with `edits` applied.
+
+    The corpus is split into byte ranges and priced across a shared process
+    pool; a second simulation started while one is running is rejected with
+    SIMULATION_BUSY. Carts untouched by the edits are skipped, and within
+    affected carts only the lines whose brand or category was edited are re-priced.
+    """
+    if not _pool_lock.acquire(blocking=False):
+        raise DiscountServiceError(ErrorCode.SIMULATION_BUSY, "A simulation is already running")
+    try:
+        return _simulate(corpus_path, baseline_rules, edits, workers or os.cpu_count() or 1)
+    finally:
+        _pool_lock.release()
+
+
+def _simulate(corpus_path: str, baseline_rules: ActiveRules, edits: RuleEdits, workers: int) -> SimulationReport:
+    scenario_rules = apply_edits(baseline_rules, edits)
+    report = SimulationReport()
+
+    if workers == 1:
+        state = _SimulationState(baseline_rules, scenario_rules, edits)
+        for start, end in _byte_ranges(corpus_path, 1):
+            report.merge(_simulate_range(corpus_path, start, end, state))
+        return report
+
+    # Several ranges per worker so a slow range does not leave the others idle
+    ranges = _byte_ranges(corpus_path, workers * 4)
+    run_id = next(_run_ids)
+    pool = _executor(workers)
+    futures = [
+        pool.submit(_simulate_task, run_id, baseline_rules, scenario_rules, edits, corpus_path, start, end)
+        for start, end in ranges
+    ]
+    try:
+        for future in futures:
+            report.merge(future.result())
+    finally:
+        for future in futures:
+            future.cancel()
+    return report
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from decimal import Decimal
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.db.models import DiscountSpendRollup
+
+logger = logging.getLogger(__name__)
+
+_RollupKey = Tuple[Optional[str], datetime, str]
+
+
+def _hour_bucket(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts - ts % 3600, tz=timezone.utc).replace(tzinfo=None)
+
+
+class SpendAggregator:
+    """
+    Write-behind aggregation of `applied_discounts` amounts per (tenant, hour, rule).
+
+    `record` only appends to a bounded buffer and never blocks the request;
+    events arriving while the buffer is full are dropped and counted. The
+    background `run` loop drains the buffer into in-memory rollups and flushes
+    them to the database in batches.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_buffered: int = 10000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._session_factory = session_factory
+        self._clock = clock
+        self.max_buffered = max_buffered
+        self._buffer: deque = deque()
+        self._lock = Lock()
+        self._pending: Dict[_RollupKey, List[int]] = {}
+        self._flushing: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed_rows = 0
+
+    def record(self, applied_discounts: Dict[str, Decimal], tenant: Optional[str] = None) -> bool:
+        if not applied_discounts:
+            return True
+        with self._lock:
+            if len(self._buffer) >= self.max_buffered:
+                self.dropped += 1
+                return False
+            self._buffer.append((self._clock(), tenant, applied_discounts))
+            self.recorded += 1
+        return True
+
+    def drain(self) -> int:
+        with self._lock:
+            events, self._buffer = self._buffer, deque()
+        for ts, tenant, applied in events:
+            hour = _hour_bucket(ts)
+            for rule, amount in applied.items():
+                amount_minor = int((amount * 100).to_integral_value())
+                if not amount_minor:
+                    # e.g. a bank offer on an empty cart: no spend, not an event
+                    continue
+                totals = self._pending.setdefault((tenant, hour, rule), [0, 0])
+                totals[0] += amount_minor
+                totals[1] += 1
+        return len(events)
+
+    def _write(self, batch: Dict[_RollupKey, List[int]]) -> None:
+        db = self._session_factory()
+        try:
+            insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+            table = DiscountSpendRollup.__table__
+            for (tenant, hour, rule), (amount_minor, events) in batch.items():
+                stmt = insert(table).values(tenant=tenant, hour=hour, rule=rule, amount_minor=amount_minor, events=events)
+                # Atomic upsert so concurrent writers (several workers, overlapping flushes) never split a rollup
+                if tenant is None:
+                    target = dict(index_elements=["hour", "rule"], index_where=text("tenant IS NULL"))
+                else:
+                    target = dict(index_elements=["tenant", "hour", "rule"])
+                stmt = stmt.on_conflict_do_update(
+                    **target,
+                    set_={
+                        "amount_minor": table.c.amount_minor + stmt.excluded.amount_minor,
+                        "events": table.c.events + stmt.excluded.events,
+                    },
+                )
+                db.execute(stmt)
+            db.commit()
+        finally:
+            db.close()
+
+    def _requeue(self, batch: Dict[_RollupKey, List[int]]) -> None:
+        for key, (amount_minor, events) in batch.items():
+            totals = self._pending.setdefault(key, [0, 0])
+            totals[0] += amount_minor
+            totals[1] += events
+
+    async def flush(self) -> int:
+        in_flight = self._flushing
+        if in_flight is not None:
+            # Let a write already in progress finish before starting the next batch
+            await asyncio.wait([in_flight])
+        task = asyncio.ensure_future(self._flush())
+        self._flushing = task
+        task.add_done_callback(lambda t: setattr(self, "_flushing", None) if self._flushing is t else None)
+        # Shielded: cancelling the caller (e.g. `run` at shutdown) never interrupts a write mid-way
+        return await asyncio.shield(task)
+
+    async def _flush(self) -> int:
+        self.drain()
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception:
+            # Keep the batch for the next flush rather than losing it
+            self._requeue(batch)
+            raise
+        self.flushed_rows += len(batch)
+        return len(batch)
+
+    async def run(self, drain_seconds: float, flush_seconds: float) -> None:
+        last_flush = time.monotonic()
+        while True:
+            await asyncio.sleep(drain_seconds)
+            self.drain()
+            if time.monotonic() - last_flush >= flush_seconds:
+                last_flush = time.monotonic()
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Failed to flush discount spend rollups")
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "buffered": buffered,
+            "max_buffered": self.max_buffered,
+            "pending_rollups": len(self._pending),
+            "flushed_rows": self.flushed_rows,
+        }
+
+
+def query_rollups(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    rule: Optional[str] = None,
+    tenant: Optional[str] = None,
+) -> List[DiscountSpendRollup]:
+    query = db.query(DiscountSpendRollup).filter(DiscountSpendRollup.tenant == tenant if tenant else DiscountSpendRollup.tenant.is_(None))
+    if start is not None:
+        query = query.filter(DiscountSpendRollup.hour >= start)
+    if end is not None:
+        query = query.filter(DiscountSpendRollup.hour < end)
+    if rule is not None:
+        query = query.filter(DiscountSpendRollup.rule == rule)
+    return query.order_by(DiscountSpendRollup.hour, DiscountSpendRollup.rule).all()
+
+
+# Process-wide aggregator; rollups for every tenant are written to the default database
+spend_aggregator = SpendAggregator(max_buffered=settings.spend_buffer_size)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import RLock
+from typing import List, Optional
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.errors import DiscountServiceError, ErrorCode
+from app.db.base import Base
+from app.db.seed import seed_data
+from app.services.rule_timeline import RuleTimeline
+
+
+_TENANT_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+@dataclass
+class _TenantEntry:
+    engine: Engine
+    session_factory: sessionmaker
+    timeline: RuleTimeline
+    lock: RLock = field(default_factory=RLock)
+
+
+class TenantRuleStore:
+    """
+    Tenant-aware rule store: one database (e.g. one SQLite file) per tenant.
+
+    Engines and loaded rule timelines are kept for at most `max_tenants`
+    tenants; the least recently used tenant is evicted (engine disposed,
+    timeline dropped) when a new one is opened.
+    """
+
+    def __init__(self, url_template: str, max_tenants: int = 64):
+        self.url_template = url_template
+        self.max_tenants = max_tenants
+        self._entries: "OrderedDict[str, _TenantEntry]" = OrderedDict()
+        self._lock = RLock()
+
+    def url_for(self, tenant_id: str) -> str:
+        if not _TENANT_ID.match(tenant_id):
+            raise DiscountServiceError(ErrorCode.TENANT_INVALID, f"Invalid tenant id {tenant_id!r}")
+        return self.url_template.format(tenant=tenant_id)
+
+    def _create_engine(self, tenant_id: str, must_exist: bool) -> Engine:
+        url = self.url_for(tenant_id)
+        parsed = make_url(url)
+        is_sqlite = parsed.get_backend_name() == "sqlite"
+        if is_sqlite and must_exist and parsed.database not in (None, "", ":memory:") and not os.path.exists(parsed.database):
+            raise DiscountServiceError(ErrorCode.TENANT_UNKNOWN, f"Unknown tenant {tenant_id}")
+        return create_engine(url, connect_args={"check_same_thread": False} if is_sqlite else {})
+
+    def _entry(self, tenant_id: str) -> _TenantEntry:
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None:
+                self._entries.move_to_end(tenant_id)
+                return entry
+            engine = self._create_engine(tenant_id, must_exist=True)
+            entry = _TenantEntry(
+                engine=engine,
+                session_factory=sessionmaker(autocommit=False, autoflush=False, bind=engine),
+                timeline=RuleTimeline(),
+            )
+            self._entries[tenant_id] = entry
+            while len(self._entries) > self.max_tenants:
+                _, cold = self._entries.popitem(last=False)
+                cold.engine.dispose()
+            return entry
+
+    def session(self, tenant_id: str) -> Session:
+        return self._entry(tenant_id).session_factory()
+
+    def timeline(self, tenant_id: str) -> RuleTimeline:
+        entry = self._entry(tenant_id)
+        if not entry.timeline.loaded:
+            with entry.lock:
+                if not entry.timeline.loaded:
+                    db = entry.session_factory()
+                    try:
+                        entry.timeline.load(db)
+                    finally:
+                        db.close()
+        return entry.timeline
+
+    def provision(self, tenant_id: str, seed: bool = False) -> None:
+        """Create the tenant's database and tables if they do not exist yet, optionally with the default rules."""
+        parsed = make_url(self.url_for(tenant_id))
+        if parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:"):
+            os.makedirs(os.path.dirname(os.path.abspath(parsed.database)), exist_ok=True)
+        engine = self._create_engine(tenant_id, must_exist=False)
+        try:
+            Base.metadata.create_all(bind=engine)
+            if seed:
+                db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+                try:
+                    seed_data(db)
+                finally:
+                    db.close()
+        finally:
+            engine.dispose()
+        # A resident tenant picks up the new rules on its next request
+        self.evict(tenant_id)
+
+    def reload_all(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            if not entry.timeline.loaded:
+                continue
+            db = entry.session_factory()
+            try:
+                entry.timeline.load(db)
+            finally:
+                db.close()
+
+    @property
+    def resident_tenants(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def evict(self, tenant_id: str) -> None:
+        with self._lock:
+            entry: Optional[_TenantEntry] = self._entries.pop(tenant_id, None)
+        if entry is not None:
+            entry.engine.dispose()
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.engine.dispose()
+
+
+# Process-wide store; requests without a tenant header keep using settings.sqlite_url
+tenant_store = TenantRuleStore(settings.tenant_db_url_template, max_tenants=settings.max_resident_tenants)
@@ -0,0 +1,46 @@
+"""
+Price-sensitivity simulator CLI.
+
+Example:
+    python -m app.simulate carts.jsonl --edits '{"brand": {"PUMA": 50}}' --workers 8
+"""
+import argparse
+import json
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.services.rule_timeline import RuleTimeline
+from app.services.simulator import RuleEdits, simulate
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay stored carts against hypothetical discount rule edits")
+    parser.add_argument("corpus", help="JSONL file, one /discounts/calculate payload per line")
+    parser.add_argument("--edits", help='JSON edits, e.g. {"brand": {"PUMA": 50}, "bank": {"ICICI": null}}')
+    parser.add_argument("--edits-file", help="Path to a JSON file with the edits")
+    parser.add_argument("--workers", type=int, default=settings.simulation_workers or None, help="Process count (default: CPU count)")
+    parser.add_argument("--db-url", default=settings.sqlite_url, help="Database holding the baseline rules")
+    args = parser.parse_args(argv)
+
+    if args.edits_file:
+        with open(args.edits_file) as fh:
+            edits = json.load(fh)
+    else:
+        edits = json.loads(args.edits or "{}")
+
+    engine = create_engine(args.db_url)
+    db = sessionmaker(bind=engine)()
+    try:
+        timeline = RuleTimeline()
+        timeline.load(db)
+    finally:
+        db.close()
+        engine.dispose()
+
+    report = simulate(args.corpus, timeline.active(), RuleEdits.from_dict(edits), workers=args.workers)
+    print(json.dumps(report.to_dict(), default=str, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Tenant administration CLI.
+
+Example:
+    python -m app.tenants provision acme --seed
+"""
+import argparse
+
+from app.services.tenant_store import tenant_store
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Manage per-tenant rule databases")
+    commands = parser.add_subparsers(dest="command", required=True)
+    provision = commands.add_parser("provision", help="Create a tenant database (idempotent)")
+    provision.add_argument("tenant_id", help="Value clients send in X-Tenant-ID")
+    provision.add_argument("--seed", action="store_true", help="Load the default rule set into the new database")
+    args = parser.parse_args(argv)
+
+    if args.command == "provision":
+        tenant_store.provision(args.tenant_id, seed=args.seed)
+        print(f"Provisioned tenant {args.tenant_id} at {tenant_store.url_for(args.tenant_id)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api import routes
+from app.db.base import Base
+from app.db.seed import seed_data
+from app.main import app
+
+
+CART = {
+    "cart_items": [
+        {
+            "product": {
+                "id": "sku-1",
+                "brand": "PUMA",
+                "brand_tier": "regular",
+                "category": "T-shirts",
+                "base_price": 1000.0,
+                "current_price": 1000.0,
+            },
+            "quantity": 1,
+            "size": "M",
+        }
+    ],
+    "customer": {"id": "cust-1", "tier": "gold"},
+    "payment_info": {"method": "CARD", "bank_name": "ICICI", "card_type": "CREDIT"},
+}
+
+
+@pytest.fixture()
+def sessions(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/default.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    seed_data(db)
+    db.close()
+
+    opened = []
+
+    def tracking_factory():
+        session = factory()
+        opened.append(session)
+        return session
+
+    monkeypatch.setattr(routes, "SessionLocal", tracking_factory)
+    return opened
+
+
+def test_calculate_computation_owns_its_session(sessions):
+    # No lifespan: the default timeline is not loaded, so pricing uses the DB fallback
+    client = TestClient(app)
+
+    response = client.post("/discounts/calculate", json=CART)
+
+    assert response.status_code == 200
+    assert response.json()["final_price"] == "486.00"
+    assert len(sessions) == 1
+    # Closed by the computation itself, independent of the request's dependencies
+    assert not sessions[0].in_transaction()
+
+
+def test_coalescing_key_is_a_digest_of_the_raw_body(sessions, monkeypatch):
+    keys = []
+    run = routes.calculate_coalescer.run
+
+    async def recording_run(key, factory):
+        keys.append(key)
+        return await run(key, factory)
+
+    monkeypatch.setattr(routes.calculate_coalescer, "run", recording_run)
+    client = TestClient(app)
+    body = json.dumps(CART)
+
+    for content in (body, body, json.dumps(CART, indent=2)):
+        response = client.post("/discounts/calculate", content=content, headers={"Content-Type": "application/json"})
+        assert response.status_code == 200
+
+    assert keys[0] == keys[1] == (None, hashlib.blake2b(body.encode(), digest_size=16).digest())
+    # Same cart, different bytes: not coalesced
+    assert keys[2] != keys[0]
+
+
+def test_untraced_requests_carry_no_trace_id(sessions, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "trace_sample_rate", 0.0)
+    client = TestClient(app)
+
+    response = client.post("/discounts/calculate", json=CART)
+
+    assert response.status_code == 200
+    assert "X-Trace-Id" not in response.headers
+
+
+def test_header_forced_trace_is_not_profiled_by_default(sessions, monkeypatch):
+    from app.core.config import settings
+    from app.core.tracing import trace_buffer
+
+    monkeypatch.setattr(settings, "trace_profile_threshold_ms", 0.001)
+    client = TestClient(app)
+
+    response = client.post("/discounts/calculate", json=CART, headers={"X-Discount-Trace": "1"})
+    trace = trace_buffer.get(response.headers["X-Trace-Id"])
+    assert trace.steps and trace.profile is None
+
+    monkeypatch.setattr(settings, "trace_header_profiling", True)
+    response = client.post("/discounts/calculate", json=CART, headers={"X-Discount-Trace": "1"})
+    assert trace_buffer.get(response.headers["X-Trace-Id"]).profile is not None
+
+
+def test_tenant_header_routes_to_tenant_rules(sessions, tmp_path, monkeypatch):
+    from app.db import models
+    from app.services.tenant_store import TenantRuleStore
+
+    store = TenantRuleStore(f"sqlite:///{tmp_path}/tenants/{{tenant}}.db")
+    store.provision("acme")
+    db = store.session("acme")
+    db.add(models.BrandDiscount(brand="PUMA", discount_percent=50))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(routes, "tenant_store", store)
+    client = TestClient(app)
+
+    default = client.post("/discounts/calculate", json=CART)
+    tenant = client.post("/discounts/calculate", json=CART, headers={"X-Tenant-ID": "acme"})
+    unknown = client.post("/discounts/calculate", json=CART, headers={"X-Tenant-ID": "nope"})
+    voucher = client.post(
+        "/discounts/validate-code",
+        json={"code": "SUPER69", "cart_items": CART["cart_items"], "customer": CART["customer"]},
+        headers={"X-Tenant-ID": "acme"},
+    )
+
+    assert default.json()["final_price"] == "486.00"
+    # acme only has PUMA 50%: no category or bank rules
+    assert tenant.json()["final_price"] == "500.00"
+    assert store.resident_tenants == ["acme"]
+    assert unknown.status_code == 400
+    assert unknown.json()["code"] == "TENANT_UNKNOWN"
+    # SUPER69 lives in the default database only
+    assert voucher.status_code == 400
+    assert voucher.json()["code"] == "DISCOUNT_CODE_INVALID"
+    store.clear()
+
+
+def test_admin_provisions_and_seeds_a_tenant(sessions, tmp_path, monkeypatch):
+    from app.api import admin
+    from app.services.tenant_store import TenantRuleStore
+
+    store = TenantRuleStore(f"sqlite:///{tmp_path}/tenants/{{tenant}}.db")
+    monkeypatch.setattr(routes, "tenant_store", store)
+    monkeypatch.setattr(admin, "tenant_store", store)
+    client = TestClient(app)
+
+    empty = client.post("/admin/tenants/bare")
+    seeded = client.post("/admin/tenants/acme", params={"seed": "true"})
+    # Provisioning again is a no-op
+    again = client.post("/admin/tenants/acme", params={"seed": "true"})
+    invalid = client.post("/admin/tenants/not%20valid")
+
+    assert (empty.status_code, seeded.status_code, again.status_code) == (201, 201, 201)
+    assert invalid.json()["code"] == "TENANT_INVALID"
+    headers = {"X-Tenant-ID": "acme"}
+    assert client.post("/discounts/calculate", json=CART, headers=headers).json()["final_price"] == "486.00"
+    assert client.post("/discounts/calculate", json=CART, headers={"X-Tenant-ID": "bare"}).json()["final_price"] == "1000.00"
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.core.coalesce import RequestCoalescer
+
+
+def test_identical_concurrent_calls_share_one_computation():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return {"value": value}
+
+    async def scenario():
+        same = [coalescer.run("cart-a", lambda: compute("a")) for _ in range(50)]
+        other = coalescer.run("cart-b", lambda: compute("b"))
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(scenario())
+
+    assert calls == ["a", "b"]
+    assert all(r is results[0] for r in results[:50])
+    assert results[-1] == {"value": "b"}
+    stats = coalescer.stats()
+    assert stats["requests"] == 51
+    assert stats["computations"] == 2
+    assert stats["coalesced"] == 49
+    assert stats["in_flight"] == 0
+
+
+def test_errors_fan_out_and_are_not_cached():
+    coalescer = RequestCoalescer()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(*(coalescer.run("k", failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def ok():
+        return 1
+
+    assert asyncio.run(coalescer.run("k", ok)) == 1
+    assert coalescer.stats()["computations"] == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_computation():
+    coalescer = RequestCoalescer()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(coalescer.run("k", compute))
+        second = asyncio.ensure_future(coalescer.run("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
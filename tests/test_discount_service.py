@@ -73,3 +73,61 @@ def test_validate_voucher(db_session):
     )
 
     assert valid is True
+
+
+def test_line_breakdown_reuses_shared_lines(db_session, monkeypatch):
+    from app.services import discount_service
+
+    calls = []
+    original_price_unit = discount_service._price_unit
+
+    def counting_price_unit(*args):
+        calls.append(args[:3])
+        return original_price_unit(*args)
+
+    monkeypatch.setattr(discount_service, "_price_unit", counting_price_unit)
+    service = DiscountService(db_session)
+
+    def make_item(sku, brand, category, price, quantity):
+        product = Product(
+            id=sku,
+            brand=brand,
+            brand_tier=BrandTier.REGULAR,
+            category=category,
+            base_price=Decimal(price),
+            current_price=Decimal(price),
+        )
+        return CartItem(product=product, quantity=quantity, size="M")
+
+    cart_items = [make_item(f"sku-{i}", "PUMA", "T-shirts", "1000.00", 2) for i in range(500)]
+    cart_items.append(make_item("sku-nike", "NIKE", "Shoes", "200", 1))
+    cart_items.append(make_item("sku-odd", "PUMA", "Shoes", "99.999", 3))
+    customer = CustomerProfile(id="cust-1", tier=CustomerTier.GOLD)
+
+    import asyncio
+    discounted = asyncio.run(service.calculate_cart_discounts(cart_items=cart_items, customer=customer))
+
+    assert len(calls) == 3
+    assert len(discounted.line_items) == 502
+    first = discounted.line_items[0]
+    assert first.product_id == "sku-0"
+    assert first.brand_discount == Decimal("400.00")
+    assert first.category_discount == Decimal("60.00")
+    assert first.final_unit_price == Decimal("540.00")
+    assert first.line_total == Decimal("1080.00")
+    assert discounted.line_items[-2].line_total == Decimal("200.00")
+    assert str(discounted.line_items[-2].unit_price) == "200.00"
+    # A 3-decimal price is quantized before pricing, so the line adds up at 2 decimals
+    odd = discounted.line_items[-1]
+    assert [str(v) for v in (odd.unit_price, odd.brand_discount, odd.final_unit_price, odd.line_total)] == [
+        "100.00",
+        "40.00",
+        "60.00",
+        "180.00",
+    ]
+    assert discounted.original_price == Decimal("1000500.00")
+    assert discounted.final_price == Decimal("540380.00")
+    assert discounted.applied_discounts == {
+        "brand:PUMA:40%": Decimal("400120.00"),
+        "category:T-shirts:10%": Decimal("60000.00"),
+    }
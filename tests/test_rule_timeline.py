@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.db import models
+from app.services.discount_service import (
+    DiscountService,
+    Product,
+    CartItem,
+    PaymentInfo,
+    CustomerProfile,
+    BrandTier,
+    CustomerTier,
+)
+from app.services.rule_timeline import RuleTimeline
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _cart():
+    product = Product(
+        id="sku-1",
+        brand="PUMA",
+        brand_tier=BrandTier.REGULAR,
+        category="T-shirts",
+        base_price=Decimal("1000.00"),
+        current_price=Decimal("1000.00"),
+    )
+    return [CartItem(product=product, quantity=1, size="M")]
+
+
+def test_timeline_switches_rules_at_boundaries(db_session):
+    sale_start = datetime(2030, 1, 1, 0, 0, 0)
+    sale_end = sale_start + timedelta(hours=2)
+    db_session.add(models.BrandDiscount(brand="PUMA", discount_percent=50, starts_at=sale_start, ends_at=sale_end))
+    db_session.add(models.Voucher(code="FLASH10", discount_percent=10, starts_at=sale_start, ends_at=sale_end))
+    db_session.commit()
+
+    clock = FakeClock(sale_start - timedelta(seconds=1))
+    timeline = RuleTimeline(clock=clock)
+    timeline.load(db_session)
+    db_session.close()  # no DB access once loaded
+
+    service = DiscountService(db_session, timeline=timeline)
+    customer = CustomerProfile(id="cust-1", tier=CustomerTier.GOLD)
+    payment_info = PaymentInfo(method="CARD", bank_name="ICICI", card_type="CREDIT")
+
+    # Before the sale: 40% brand, 10% category, 10% bank => 486
+    result = asyncio.run(service.calculate_cart_discounts(_cart(), customer, payment_info))
+    assert result.final_price == Decimal("486.00")
+    assert "FLASH10" not in timeline.active().vouchers
+
+    # Exactly at the boundary the sale rule wins: 1000 -> 500 -> 450 -> 405
+    clock.now = sale_start
+    result = asyncio.run(service.calculate_cart_discounts(_cart(), customer, payment_info))
+    assert result.final_price == Decimal("405.00")
+    assert "brand:PUMA:50%" in result.applied_discounts
+    assert asyncio.run(service.validate_discount_code("FLASH10", _cart(), customer)) is True
+
+    # After the sale the base rule is restored and the voucher is gone
+    clock.now = sale_end
+    result = asyncio.run(service.calculate_cart_discounts(_cart(), customer, payment_info))
+    assert result.final_price == Decimal("486.00")
+    assert timeline.active().vouchers.get("FLASH10") is None
+    assert timeline.next_boundary == float("inf")
+
+
+def test_db_fallback_ignores_inactive_rules(db_session):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db_session.add(
+        models.BrandDiscount(
+            brand="PUMA", discount_percent=90, starts_at=now + timedelta(days=1), ends_at=now + timedelta(days=2)
+        )
+    )
+    db_session.add(models.BankOffer(bank_name="ICICI", payment_method="CARD", discount_percent=50, ends_at=now - timedelta(days=1)))
+    db_session.commit()
+
+    service = DiscountService(db_session)
+    customer = CustomerProfile(id="cust-1", tier=CustomerTier.GOLD)
+    payment_info = PaymentInfo(method="CARD", bank_name="ICICI", card_type="CREDIT")
+
+    result = asyncio.run(service.calculate_cart_discounts(_cart(), customer, payment_info))
+    assert result.final_price == Decimal("486.00")
+
+
+def test_second_open_ended_rule_is_rejected(db_session):
+    # conftest already seeds open-ended PUMA and T-shirts rules
+    for rule in (
+        models.BrandDiscount(brand="PUMA", discount_percent=10),
+        models.CategoryDiscount(category="T-shirts", discount_percent=5),
+    ):
+        db_session.add(rule)
+        with pytest.raises(IntegrityError):
+            db_session.commit()
+        db_session.rollback()
+
+    # A windowed rule for the same brand is still allowed
+    db_session.add(models.BrandDiscount(brand="PUMA", discount_percent=50, starts_at=datetime(2030, 1, 1)))
+    db_session.commit()
+
+
+def test_voucher_code_can_be_scheduled_for_back_to_back_windows(db_session):
+    first = datetime(2030, 1, 1)
+    second = first + timedelta(days=1)
+    db_session.add(models.Voucher(code="FLASH", discount_percent=10, starts_at=first, ends_at=second))
+    db_session.add(models.Voucher(code="FLASH", discount_percent=20, starts_at=second, ends_at=second + timedelta(days=1)))
+    db_session.commit()
+
+    # Same code and start is still a duplicate
+    db_session.add(models.Voucher(code="FLASH", discount_percent=30, starts_at=first))
+    with pytest.raises(IntegrityError):
+        db_session.commit()
+    db_session.rollback()
+
+    clock = FakeClock(first)
+    timeline = RuleTimeline(clock=clock)
+    timeline.load(db_session)
+    assert timeline.active().vouchers["FLASH"].discount_percent == 10
+    clock.now = second
+    assert timeline.active().vouchers["FLASH"].discount_percent == 20
+    clock.now = second + timedelta(days=1)
+    assert "FLASH" not in timeline.active().vouchers
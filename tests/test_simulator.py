@@ -0,0 +1,134 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from app.core.errors import DiscountServiceError, ErrorCode
+from app.services import discount_service, simulator
+from app.services.rule_timeline import RuleTimeline
+from app.services.simulator import RuleEdits, apply_edits, simulate
+
+
+def _cart(brand, category, price, quantity=1, voucher_code=None):
+    return {
+        "cart_items": [
+            {
+                "product": {
+                    "id": f"{brand}-{category}",
+                    "brand": brand,
+                    "brand_tier": "regular",
+                    "category": category,
+                    "base_price": price,
+                    "current_price": price,
+                },
+                "quantity": quantity,
+                "size": "M",
+            }
+        ],
+        "customer": {"id": "cust-1", "tier": "gold"},
+        "payment_info": {"method": "CARD", "bank_name": "ICICI", "card_type": "CREDIT"},
+        "voucher_code": voucher_code,
+    }
+
+
+def _write_corpus(path, carts):
+    path.write_text("".join(json.dumps(c) + "\n" for c in carts))
+    return str(path)
+
+
+def _baseline(db_session):
+    timeline = RuleTimeline()
+    timeline.load(db_session)
+    return timeline.active()
+
+
+def test_brand_edit_reports_revenue_and_spend_change(db_session, tmp_path):
+    corpus = _write_corpus(
+        tmp_path / "carts.jsonl",
+        [_cart("PUMA", "T-shirts", 1000), _cart("NIKE", "Shoes", 500), _cart("PUMA", "T-shirts", 1000, voucher_code="SUPER69")],
+    )
+
+    report = simulate(corpus, _baseline(db_session), RuleEdits(brand={"PUMA": 50}), workers=1)
+
+    assert report.carts == 3
+    assert report.affected_carts == 2
+    # 486.00 -> 405.00 without voucher, 150.66 -> 125.55 with SUPER69
+    assert report.baseline_revenue == Decimal("636.66")
+    assert report.scenario_revenue == Decimal("530.55")
+    assert report.revenue_delta == Decimal("-106.11")
+    assert report.discount_delta == Decimal("106.11")
+    assert report.rule_deltas["brand:PUMA:40%"] == Decimal("-800.00")
+    assert report.rule_deltas["brand:PUMA:50%"] == Decimal("1000.00")
+
+
+def test_only_edited_lines_are_repriced(db_session, tmp_path, monkeypatch):
+    calls = []
+    original_price_unit = discount_service._price_unit
+
+    def counting_price_unit(*args):
+        calls.append(args[0])
+        return original_price_unit(*args)
+
+    monkeypatch.setattr(discount_service, "_price_unit", counting_price_unit)
+    cart = _cart("PUMA", "T-shirts", 1000)
+    cart["cart_items"].append(_cart("NIKE", "Shoes", 500)["cart_items"][0])
+    corpus = _write_corpus(tmp_path / "carts.jsonl", [cart] * 20)
+
+    report = simulate(corpus, _baseline(db_session), RuleEdits(brand={"PUMA": 50}), workers=1)
+
+    assert report.affected_carts == 20
+    # Baseline PUMA + NIKE once, scenario PUMA once; NIKE reuses the baseline pricing
+    assert sorted(calls) == ["NIKE", "PUMA", "PUMA"]
+
+
+def test_removed_voucher_and_bank_edits(db_session, tmp_path):
+    baseline = _baseline(db_session)
+    scenario = apply_edits(baseline, RuleEdits(voucher={"SUPER69": None}, bank={"ICICI": 15}))
+    assert "SUPER69" not in scenario.vouchers
+    assert scenario.bank_offers[("ICICI", "CARD")][0].discount_percent == 15
+
+    corpus = _write_corpus(tmp_path / "carts.jsonl", [_cart("PUMA", "T-shirts", 1000, voucher_code="SUPER69")] * 4)
+    single = simulate(corpus, baseline, RuleEdits(voucher={"SUPER69": None}), workers=1)
+    pooled = simulate(corpus, baseline, RuleEdits(voucher={"SUPER69": None}), workers=2)
+
+    assert single.voucher_rejections == 4
+    # Without the voucher each cart pays 486.00 instead of 150.66
+    assert single.revenue_delta == Decimal("1341.36")
+    assert pooled.to_dict() == single.to_dict()
+
+
+def test_bank_method_edit_only_affects_that_method(db_session, tmp_path):
+    upi_cart = _cart("NIKE", "Shoes", 500)
+    upi_cart["payment_info"] = {"method": "UPI", "bank_name": "ICICI", "card_type": None}
+    corpus = _write_corpus(tmp_path / "carts.jsonl", [_cart("NIKE", "Shoes", 500)] * 3 + [upi_cart])
+
+    report = simulate(corpus, _baseline(db_session), RuleEdits(bank={"ICICI:UPI": 5}), workers=1)
+
+    # ICICI CARD carts keep their offer; only the UPI cart is re-priced
+    assert report.carts == 4
+    assert report.affected_carts == 1
+    assert report.revenue_delta == Decimal("-25.00")
+
+
+def test_simulations_share_one_spawned_pool_and_do_not_overlap(db_session, tmp_path):
+    baseline = _baseline(db_session)
+    corpus = _write_corpus(
+        tmp_path / "carts.jsonl", [_cart("PUMA", "T-shirts", 1000, voucher_code="SUPER69"), _cart("NIKE", "Shoes", 500)] * 4
+    )
+    try:
+        first = simulate(corpus, baseline, RuleEdits(voucher={"SUPER69": None}), workers=2)
+        pool = simulator._pool
+        # Workers rebuild their state for the next simulation's edits
+        second = simulate(corpus, baseline, RuleEdits(brand={"PUMA": 50}), workers=2)
+
+        assert simulator._pool is pool
+        assert pool._mp_context.get_start_method() == "spawn"
+        assert first.to_dict() == simulate(corpus, baseline, RuleEdits(voucher={"SUPER69": None}), workers=1).to_dict()
+        assert second.to_dict() == simulate(corpus, baseline, RuleEdits(brand={"PUMA": 50}), workers=1).to_dict()
+
+        with simulator._pool_lock:
+            with pytest.raises(DiscountServiceError) as busy:
+                simulate(corpus, baseline, RuleEdits(brand={"PUMA": 50}), workers=1)
+        assert busy.value.code == ErrorCode.SIMULATION_BUSY
+    finally:
+        simulator.shutdown_executor()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.services.spend_aggregator import SpendAggregator, query_rollups
+
+
+def _session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/spend.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_rollups_are_aggregated_per_hour_and_flushed_in_batches(tmp_path):
+    SessionFactory = _session_factory(tmp_path)
+    now = datetime(2026, 10, 19, 10, 15, tzinfo=timezone.utc).timestamp()
+    aggregator = SpendAggregator(session_factory=SessionFactory, max_buffered=100, clock=lambda: now)
+
+    applied = {"brand:PUMA:40%": Decimal("400.00"), "bank:ICICI:10%": Decimal("54.00")}
+    for _ in range(3):
+        assert aggregator.record(applied)
+    assert asyncio.run(aggregator.flush()) == 2
+
+    # A second flush merges into the existing hourly rows; zero amounts are not events
+    aggregator.record({"brand:PUMA:40%": Decimal("0.10"), "bank:ICICI:10%": Decimal("0.00")})
+    asyncio.run(aggregator.flush())
+
+    db = SessionFactory()
+    try:
+        rows = {row.rule: row for row in query_rollups(db)}
+    finally:
+        db.close()
+    assert rows["brand:PUMA:40%"].amount_minor == 120010
+    assert rows["brand:PUMA:40%"].events == 4
+    assert rows["bank:ICICI:10%"].amount_minor == 16200
+    assert rows["bank:ICICI:10%"].events == 3
+    assert rows["bank:ICICI:10%"].hour == datetime(2026, 10, 19, 10, 0)
+    assert aggregator.stats()["flushed_rows"] == 3
+
+
+def test_full_buffer_drops_and_counts(tmp_path):
+    aggregator = SpendAggregator(session_factory=_session_factory(tmp_path), max_buffered=2)
+    applied = {"brand:PUMA:40%": Decimal("400.00")}
+
+    results = [aggregator.record(applied) for _ in range(5)]
+
+    assert results == [True, True, False, False, False]
+    stats = aggregator.stats()
+    assert stats["dropped"] == 3
+    assert stats["buffered"] == 2
+
+    # Draining frees the buffer again
+    aggregator.drain()
+    assert aggregator.record(applied) is True
+
+
+def test_concurrent_writers_upsert_into_one_row_per_key(tmp_path):
+    SessionFactory = _session_factory(tmp_path)
+    now = datetime(2026, 10, 19, 10, 15, tzinfo=timezone.utc).timestamp()
+    writers = [SpendAggregator(session_factory=SessionFactory, clock=lambda: now) for _ in range(2)]
+
+    for tenant in (None, "acme"):
+        for aggregator in writers:
+            aggregator.record({"brand:PUMA:40%": Decimal("400.00")}, tenant=tenant)
+    for aggregator in writers:
+        asyncio.run(aggregator.flush())
+
+    db = SessionFactory()
+    try:
+        default_rows = query_rollups(db)
+        tenant_rows = query_rollups(db, tenant="acme")
+    finally:
+        db.close()
+    assert [(row.amount_minor, row.events) for row in default_rows] == [(80000, 2)]
+    assert [(row.amount_minor, row.events) for row in tenant_rows] == [(80000, 2)]
+
+
+def test_cancelling_the_caller_does_not_interrupt_a_flush(tmp_path):
+    SessionFactory = _session_factory(tmp_path)
+    aggregator = SpendAggregator(session_factory=SessionFactory)
+    write = aggregator._write
+    started = threading.Event()
+
+    def slow_write(batch):
+        started.set()
+        time.sleep(0.1)
+        write(batch)
+
+    aggregator._write = slow_write
+
+    async def scenario():
+        aggregator.record({"brand:PUMA:40%": Decimal("400.00")})
+        caller = asyncio.ensure_future(aggregator.flush())
+        await asyncio.to_thread(started.wait)
+        caller.cancel()
+        # Shutdown path: waits for the in-flight write, then flushes the remainder
+        aggregator.record({"brand:PUMA:40%": Decimal("1.00")})
+        await aggregator.flush()
+        assert caller.cancelled()
+
+    asyncio.run(scenario())
+
+    db = SessionFactory()
+    try:
+        rows = query_rollups(db)
+    finally:
+        db.close()
+    assert [(row.amount_minor, row.events) for row in rows] == [(40100, 2)]
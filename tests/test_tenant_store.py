@@ -0,0 +1,76 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from app.core.errors import DiscountServiceError, ErrorCode
+from app.db import models
+from app.services.discount_service import (
+    DiscountService,
+    Product,
+    CartItem,
+    CustomerProfile,
+    BrandTier,
+    CustomerTier,
+)
+from app.services.tenant_store import TenantRuleStore
+
+
+def _provision(store, tenant_id, puma_percent):
+    store.provision(tenant_id)
+    db = store.session(tenant_id)
+    try:
+        db.add(models.BrandDiscount(brand="PUMA", discount_percent=puma_percent))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _price(store, tenant_id):
+    product = Product(
+        id="sku-1",
+        brand="PUMA",
+        brand_tier=BrandTier.REGULAR,
+        category="T-shirts",
+        base_price=Decimal("1000.00"),
+        current_price=Decimal("1000.00"),
+    )
+    service = DiscountService(store.session(tenant_id), timeline=store.timeline(tenant_id))
+    result = asyncio.run(
+        service.calculate_cart_discounts([CartItem(product=product, quantity=1, size="M")], CustomerProfile(id="c", tier=CustomerTier.GOLD))
+    )
+    service.db.close()
+    return result.final_price
+
+
+def test_tenants_are_isolated_and_cold_tenants_evicted(tmp_path):
+    store = TenantRuleStore(f"sqlite:///{tmp_path}/tenants/{{tenant}}.db", max_tenants=2)
+    _provision(store, "in", 40)
+    _provision(store, "sg", 20)
+    _provision(store, "ae", 10)
+
+    assert _price(store, "in") == Decimal("600.00")
+    assert _price(store, "sg") == Decimal("800.00")
+    assert store.resident_tenants == ["in", "sg"]
+
+    # Opening a third tenant evicts the least recently used one
+    assert _price(store, "ae") == Decimal("900.00")
+    assert store.resident_tenants == ["sg", "ae"]
+
+    # An evicted tenant is transparently reloaded on next use
+    assert _price(store, "in") == Decimal("600.00")
+    assert store.resident_tenants == ["ae", "in"]
+    store.clear()
+
+
+def test_invalid_and_unknown_tenants_are_rejected(tmp_path):
+    store = TenantRuleStore(f"sqlite:///{tmp_path}/{{tenant}}.db")
+
+    with pytest.raises(DiscountServiceError) as exc:
+        store.timeline("../etc/passwd")
+    assert exc.value.code == ErrorCode.TENANT_INVALID
+
+    with pytest.raises(DiscountServiceError) as exc:
+        store.timeline("missing")
+    assert exc.value.code == ErrorCode.TENANT_UNKNOWN
+    assert not (tmp_path / "missing.db").exists()
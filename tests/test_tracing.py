@@ -0,0 +1,69 @@
+import asyncio
+from decimal import Decimal
+
+from app.core.tracing import RequestProfiler, Trace, TraceBuffer, end_trace, start_trace
+from app.services.discount_service import (
+    DiscountService,
+    Product,
+    CartItem,
+    PaymentInfo,
+    CustomerProfile,
+    BrandTier,
+    CustomerTier,
+)
+
+
+def test_trace_records_cache_and_rule_steps(db_session):
+    service = DiscountService(db_session)
+    product = Product(
+        id="sku-1",
+        brand="PUMA",
+        brand_tier=BrandTier.REGULAR,
+        category="T-shirts",
+        base_price=Decimal("1000.00"),
+        current_price=Decimal("1000.00"),
+    )
+    cart_items = [CartItem(product=product, quantity=1, size="M")]
+    customer = CustomerProfile(id="cust-1", tier=CustomerTier.GOLD)
+    payment_info = PaymentInfo(method="CARD", bank_name="ICICI", card_type="CREDIT")
+
+    async def traced_calculate():
+        trace, token = start_trace("calculate")
+        try:
+            await service.calculate_cart_discounts(cart_items, customer, payment_info, voucher_code="SUPER69")
+        finally:
+            end_trace(token)
+        trace.finish()
+        return trace
+
+    trace = asyncio.run(traced_calculate())
+    steps = [(s["step"], s.get("key") or s.get("rule")) for s in trace.steps]
+
+    assert ("cache.miss", "brand_discounts") in steps
+    assert ("cache.miss", "voucher:SUPER69") in steps
+    # The voucher validation reuses the entry cached by the calculation
+    assert ("cache.hit", "voucher:SUPER69") in steps
+    assert ("rule.evaluate", "bank:ICICI:10%") in steps
+    assert all(isinstance(s["at_ns"], int) for s in trace.steps)
+    miss = next(s for s in trace.steps if s["step"] == "cache.miss")
+    assert miss["duration_ns"] > 0
+
+
+def test_trace_buffer_is_bounded_and_profiles_slow_requests():
+    buffer = TraceBuffer(maxlen=3)
+    traces = []
+    for i in range(5):
+        trace = Trace(f"req-{i}")
+        profiler = RequestProfiler(threshold_ms=0 if i == 4 else 60_000)
+        profiler.start()
+        sum(range(1000))
+        trace.finish()
+        profiler.stop(trace)
+        buffer.add(trace)
+        traces.append(trace)
+
+    listed = buffer.list()
+    assert [t["name"] for t in listed] == ["req-4", "req-3", "req-2"]
+    assert buffer.get(traces[0].id) is None
+    assert buffer.get(traces[4].id).profile is not None
+    assert traces[3].profile is None